@@ -1,5 +1,4 @@
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.llm import chat_model
 from app.tools.airways import get_airways_route_info
 from app.tools.roadways import get_roadways_route_info
 from app.tools.railways import get_railways_route_info
@@ -7,34 +6,44 @@ from app.tools.seaways import get_seaways_route_info
 # from dotenv import load_dotenv
 from langgraph.graph import MessagesState, StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import AIMessage, SystemMessage
+from app.structured_output import structured, invoke_structured, StructuredOutputError
+from app.schemas import RouteOptions
+from app.tracing import traced
+from app.deadline import bounded, DeadlineExceeded
+from app import deadline
+import orjson
 import os
-import json
 
 # load_dotenv()
 
+# Seconds of the request's budget kept back from the tools for the summarizer, so that
+# slow tools still leave time to summarize what the others found
+SUMMARIZER_RESERVE = float(os.getenv("ROUTE_SUMMARIZER_RESERVE", 15))
+
 tools = [
-    get_airways_route_info,
-    get_railways_route_info,
-    get_roadways_route_info,
-    get_seaways_route_info
+    bounded("tool.airways", SUMMARIZER_RESERVE)(get_airways_route_info),
+    bounded("tool.railways", SUMMARIZER_RESERVE)(get_railways_route_info),
+    bounded("tool.roadways", SUMMARIZER_RESERVE)(get_roadways_route_info),
+    bounded("tool.seaways", SUMMARIZER_RESERVE)(get_seaways_route_info)
 ]
 
-planner_llm = ChatOpenAI(model='gpt-4o-mini')
-final_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+class RouteState(MessagesState):
+    routes: list
+
+planner_llm = chat_model("openai")
+final_llm = chat_model("google")
 
 planner_llm_with_tools = planner_llm.bind_tools(tools)
+summarizer_llm = structured(final_llm, RouteOptions)
 
 sys_msg = SystemMessage(content="You are a travel planner that uses tools to gather info, then another assistant will summarize it.")
 
 summarizer_sys_msg = SystemMessage(content="""You are a travel route summarizer.
 
-You must return your response as a valid JSON array containing exactly 3 route options. Each route should be optimized for different priorities (cost, time, carbon emissions).
+You must return exactly 3 route options. Each route should be optimized for different priorities (cost, time, carbon emissions).
 
-Format each route as:
+Format the routes as:
 [
     {
         "total_cost": <number in INR>,
@@ -54,7 +63,6 @@ Format each route as:
 
 Important:
 - Consider multi-modal routes (e.g., Pune→Mumbai by road, then Mumbai→California by ship)
-- Return ONLY the JSON array, no additional text
 
 - Railway Station CODES for ixigo, Pass exactly this names else tool call will fail:
     Pune - "PUNE"
@@ -70,37 +78,21 @@ Important:
 """)
 
 # Stage 1: Tool calling
-def planner_node(state: MessagesState):
+@traced("agent.planner")
+def planner_node(state: RouteState):
+    deadline.check()
     return {"messages": [planner_llm_with_tools.invoke([sys_msg] + state["messages"])]}
 
-def summarizer_node(state: MessagesState):
+@traced("agent.summarizer")
+def summarizer_node(state: RouteState):
     all_messages = [summarizer_sys_msg] + state["messages"]
-    
-    response = final_llm.invoke(all_messages)
-    
+
     try:
-        json_content = response.content.strip()
-        
-        if json_content.startswith('```json'):
-            json_content = json_content.replace('```json', '').replace('```', '').strip()
-        elif json_content.startswith('```'):
-            json_content = json_content.replace('```', '').strip()
-        
-        parsed_json = json.loads(json_content)
-        
-        if not isinstance(parsed_json, list) or len(parsed_json) != 3:
-            raise ValueError("Response must be a JSON array with exactly 3 routes")
-        
-        for i, route in enumerate(parsed_json):
-            required_fields = ['total_cost', 'total_time', 'total_carbon_emission', 'route']
-            for field in required_fields:
-                if field not in route:
-                    raise ValueError(f"Route {i+1} missing required field: {field}")
-        
-        response.content = json.dumps(parsed_json, indent=2)
-        
-    except (json.JSONDecodeError, ValueError) as e:
-        error_response = [{
+        options = invoke_structured(summarizer_llm, all_messages, "summarizer")
+        routes = [route.model_dump(by_alias=True) for route in options.routes]
+    except (StructuredOutputError, DeadlineExceeded) as e:
+        reason = "Ran out of time summarizing" if isinstance(e, DeadlineExceeded) else "JSON parsing failed"
+        routes = [{
             "total_cost": 0,
             "total_time": "Error",
             "total_carbon_emission": "Error",
@@ -109,14 +101,14 @@ def summarizer_node(state: MessagesState):
                 "to": "Error", 
                 "distance": "Error",
                 "by": "Error",
-                "feature": f"JSON parsing failed: {str(e)}"
+                "feature": f"{reason}: {str(e)}"
             }]
         }]
-        response.content = json.dumps(error_response, indent=2)
-    
-    return {"messages": [response]}
 
-builder = StateGraph(MessagesState)
+    # The routes travel in the state as data; the message only records them in the transcript
+    return {"routes": routes, "messages": [AIMessage(content=orjson.dumps(routes).decode())]}
+
+builder = StateGraph(RouteState)
 builder.add_node("planner", planner_node)
 builder.add_node("tools", ToolNode(tools))
 builder.add_node("summarizer", summarizer_node)
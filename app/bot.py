@@ -1,26 +1,55 @@
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, RemoveMessage
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import tools_condition, ToolNode
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph import MessagesState
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 import aiosqlite
+import argparse
+import asyncio
 import json
-import os
 
-from app.routers.products import get_products
-from app.routers.stock_forecast import stock_forecast
+from app.routers.products import search_products
+from app.routers.stock_forecast import forecast_stock
 from app.routers.route_optimizer import best_route 
 from app.routers.resource_optimizer import resource_optimizer
+from app.llm import chat_model
+from app.tracing import traced, span
+from app import metrics
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+CHATS_DB_PATH = "chats/test.db"
+
+# Sent first in every model call, and never stored in the threads: an identical prefix on
+# every call is what providers cache
+SYSTEM_PROMPT = """You are a chatbot for transpectra, a warehouse and inventory management platform that revolutionalizes logistics. You need to answer the queries of the warehouse managar, regarding the warehouse, tell him the amount of stock that he might require, tell him the best routes to ship cargos, tell him the resources that he might require in a day and answer all the basic doubts related to logistics and warehouse management.
+
+You are very creative when it comes to displaying outputs, so showcase your expert markdown skills and give visually stunning outputs.
+
+Your answer should short, clear and should solve the query of the user.
+
+Your tone must be polite and helpful. The user should be satisfied by your answer. You can ask the user follow up questions, to make your response evenn better?
+
+You may use the tools that you have access to, only when required.
+Give a beautiful Response, you may use markdown for your response. But provide a appealing output by which the user gets impressed.
+
+Give as fancy and creative output as possible. Make full use of markdown, the output should look very very good. Keep in mind. Make use of emojis, tables, different colors and any other thing if you can, the output should be visually stunning."""
+
+# Estimated at ~4 characters per token
+SYSTEM_PROMPT_TOKENS = len(SYSTEM_PROMPT) // 4
+
+# Upper bounds of the buckets of bot_prompt_tokens_saved_per_turn
+TOKEN_BUCKETS = (0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+# Prompt tokens saved in the turn being handled, added up by its model calls
+_saved_tokens: ContextVar[Optional[list]] = ContextVar("saved_tokens", default=None)
+
+llm = chat_model("google")
 
 tools = [
-    get_products,
-    stock_forecast,
+    search_products,
+    forecast_stock,
     best_route,
     resource_optimizer
 ]
@@ -30,28 +59,73 @@ llm = llm.bind_tools(tools)
 class State(MessagesState):
     summary: str
 
+def model_messages(state: State) -> list:
+    """
+    The messages of a model call: the system prompt with the summary of earlier turns,
+    then the thread. Copies of the prompt that older versions stored in the thread are skipped.
+    """
+    summary = state.get("summary", "")
+    system = SYSTEM_PROMPT + (f"\n\nSummary of conversation earlier: {summary}" if summary else "")
+    return [SystemMessage(content=system)] + [m for m in state["messages"] if not isinstance(m, SystemMessage)]
+
+def stored_prompts(state: State) -> list:
+    """
+    Removals of the copies of the system prompt older versions stored with every user message.
+    """
+    return [RemoveMessage(id=m.id) for m in state["messages"] if isinstance(m, SystemMessage)]
+
+def record_saved_tokens(state: State, copies_sent: int):
+    # With the prompt stored per turn, a call sent one copy for every turn in the thread
+    turns = sum(isinstance(m, HumanMessage) for m in state["messages"])
+    saved = _saved_tokens.get()
+    if saved is not None:
+        saved[0] += max(0, turns - copies_sent) * SYSTEM_PROMPT_TOKENS
+
+@contextmanager
+def turn():
+    """
+    Records the prompt tokens the model calls of the block saved in bot_prompt_tokens_saved_per_turn.
+    """
+    saved = [0]
+    token = _saved_tokens.set(saved)
+    try:
+        yield
+    finally:
+        _saved_tokens.reset(token)
+        metrics.observe("bot_prompt_tokens_saved_per_turn", saved[0], buckets=TOKEN_BUCKETS)
+
+class TracedSqliteSaver(AsyncSqliteSaver):
+    async def aget_tuple(self, config):
+        with span("checkpointer.get"):
+            return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with span("checkpointer.put"):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        with span("checkpointer.put_writes"):
+            return await super().aput_writes(config, writes, task_id, task_path)
+
 async def get_bot():
-    conn = await aiosqlite.connect("chats/test.db", check_same_thread=False)
-    memory = AsyncSqliteSaver(conn)
+    conn = await aiosqlite.connect(CHATS_DB_PATH, check_same_thread=False)
+    memory = TracedSqliteSaver(conn)
 
+    @traced("bot.assistant")
     async def assistant(state: State):
-        summary = state.get("summary", "")
-        if summary:
-            system_message = SystemMessage(content=f"Summary of conversation earlier: {summary}")
-            messages = [system_message] + state["messages"]
-        else:
-            messages = state["messages"]
-
-        response = await llm.ainvoke(messages)
+        response = await llm.ainvoke(model_messages(state))
+        record_saved_tokens(state, 1)
         print(f"LLM Response: {response}")
         
+        # Threads from before the prompt was sent per call lose their stored copies
         if hasattr(response, 'tool_calls') and response.tool_calls:
             print(f"Tool calls detected: {response.tool_calls}")
-            return {"messages": [response]}  # Return the full response with tool calls
+            return {"messages": stored_prompts(state) + [response]}  # Return the full response with tool calls
         else:
             print("No tool calls detected")
-            return {"messages": [response]}
+            return {"messages": stored_prompts(state) + [response]}
 
+    @traced("bot.summarize")
     async def summarize_conversation(state: State):
         summary = state.get("summary", "")
         if summary:
@@ -62,8 +136,9 @@ async def get_bot():
         else:
             summary_message = "Create a summary of the conversation above:"
 
-        messages = state["messages"] + [HumanMessage(content=summary_message)]
+        messages = [m for m in state["messages"] if not isinstance(m, SystemMessage)] + [HumanMessage(content=summary_message)]
         response = await llm.ainvoke(messages)
+        record_saved_tokens(state, 0)
 
         delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
 
@@ -124,21 +199,17 @@ async def get_bot():
 
 
 async def get_bot_simple():
-    conn = await aiosqlite.connect("chats/test.db", check_same_thread=False)
-    memory = AsyncSqliteSaver(conn)
+    conn = await aiosqlite.connect(CHATS_DB_PATH, check_same_thread=False)
+    memory = TracedSqliteSaver(conn)
 
+    @traced("bot.assistant")
     async def assistant(state: State):
-        summary = state.get("summary", "")
-        if summary:
-            system_message = SystemMessage(content=f"Summary of conversation earlier: {summary}")
-            messages = [system_message] + state["messages"]
-        else:
-            messages = state["messages"]
-
-        response = await llm.ainvoke(messages)
+        response = await llm.ainvoke(model_messages(state))
+        record_saved_tokens(state, 1)
         print(f"Assistant response: {response}")
-        return {"messages": [response]}
+        return {"messages": stored_prompts(state) + [response]}
 
+    @traced("bot.summarize")
     async def summarize_conversation(state: State):
         summary = state.get("summary", "")
         if summary:
@@ -146,8 +217,9 @@ async def get_bot_simple():
         else:
             summary_message = "Create a summary of the conversation above:"
 
-        messages = state["messages"] + [HumanMessage(content=summary_message)]
+        messages = [m for m in state["messages"] if not isinstance(m, SystemMessage)] + [HumanMessage(content=summary_message)]
         response = await llm.ainvoke(messages)
+        record_saved_tokens(state, 0)
         
         delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
         summary_text = response.content if hasattr(response, 'content') else str(response)
@@ -189,4 +261,42 @@ async def get_bot_simple():
     workflow.add_edge("summarize", END)
 
     agent = workflow.compile(checkpointer=memory)
-    return agent, conn
\ No newline at end of file
+    return agent, conn
+
+
+async def migrate() -> tuple[int, int]:
+    """
+    Removes the copies of the system prompt older versions stored in every thread.
+
+    Returns:
+        tuple: (threads changed, messages removed)
+    """
+    agent, conn = await get_bot()
+    try:
+        await agent.checkpointer.setup()
+        async with conn.execute("SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_ns = ''") as cursor:
+            thread_ids = [row[0] for row in await cursor.fetchall()]
+
+        threads = removed = 0
+        for thread_id in thread_ids:
+            config = {"configurable": {"thread_id": thread_id}}
+            state = await agent.aget_state(config)
+            removals = stored_prompts(state.values) if state.values.get("messages") else []
+            if removals:
+                # As the summarizer, whose only edge is to END, so the thread has nothing left to run
+                await agent.aupdate_state(config, {"messages": removals}, as_node="summarize_conversation")
+                threads += 1
+                removed += len(removals)
+        return threads, removed
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance of the bot's chat threads.")
+    parser.add_argument("--migrate", action="store_true", required=True,
+                        help="Remove the system prompts stored in the threads by older versions")
+    args = parser.parse_args()
+
+    threads, removed = asyncio.run(migrate())
+    print(f"Removed {removed} stored system prompts (~{removed * SYSTEM_PROMPT_TOKENS} tokens) from {threads} threads")
@@ -0,0 +1,110 @@
+from app.models.feature_store import feature_store
+from collections import Counter
+from bisect import bisect_left
+from threading import Lock
+from typing import Optional
+import difflib
+import hashlib
+import json
+
+# Similarity (0..1) a name needs to count as a fuzzy match
+FUZZY_CUTOFF = 0.6
+
+
+class Catalog:
+    """
+    Search index over the distinct (name, category) products of the dataset.
+
+    Names and the words inside them are kept in sorted arrays, so a prefix query is two
+    binary searches. Misspelt queries can fall back to difflib's closest matches.
+    """
+    def __init__(self, names: list[str], categories: list[str]):
+        self.names = names
+        self.categories = categories
+
+        names_sorted = sorted((name.lower(), i) for i, name in enumerate(names))
+        self.name_keys = [key for key, _ in names_sorted]
+        self.name_ids = [i for _, i in names_sorted]
+
+        # Later words of a name, so 'cheese' finds 'Amul Cheese'
+        words_sorted = sorted((word, i) for i, name in enumerate(names) for word in name.lower().split()[1:])
+        self.word_keys = [key for key, _ in words_sorted]
+        self.word_ids = [i for _, i in words_sorted]
+
+        self.lower_names = [name.lower() for name in names]
+        self.etag = hashlib.sha1(json.dumps([names, categories]).encode()).hexdigest()
+
+    @staticmethod
+    def _prefix(keys: list[str], ids: list[int], prefix: str) -> list[int]:
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\uffff')
+        return ids[start:end]
+
+    def search(self, query: str = "", fuzzy: bool = False) -> list[int]:
+        """
+        Indices of the products matching query: name prefixes first, then word prefixes,
+        then (with fuzzy) the closest names by similarity.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self.names)))
+
+        matches = dict.fromkeys(
+            sorted(self._prefix(self.name_keys, self.name_ids, query), key=self.lower_names.__getitem__)
+        )
+        matches.update(dict.fromkeys(
+            sorted(self._prefix(self.word_keys, self.word_ids, query), key=self.lower_names.__getitem__)
+        ))
+        if fuzzy:
+            close = difflib.get_close_matches(query, self.lower_names, n=len(self.names), cutoff=FUZZY_CUTOFF)
+            matches.update(dict.fromkeys(
+                i for name in close for i, lower in enumerate(self.lower_names) if lower == name
+            ))
+        return list(matches)
+
+    def page(
+        self,
+        query: str = "",
+        category: Optional[str] = None,
+        fuzzy: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> dict:
+        """
+        Returns:
+            dict: {"products": [names on this page], "total": matches, "offset": ..., "limit": ...,
+                   "categories": {category: matches}}. The category counts ignore the category filter.
+        """
+        found = self.search(query, fuzzy)
+        facets = Counter(self.categories[i] for i in found)
+        if category:
+            found = [i for i in found if self.categories[i] == category]
+
+        end = None if limit is None else offset + limit
+        return {
+            "products": [self.names[i] for i in found[offset:end]],
+            "total": len(found),
+            "offset": offset,
+            "limit": limit,
+            "categories": dict(sorted(facets.items()))
+        }
+
+
+_catalog = None
+_catalog_version = None
+_lock = Lock()
+
+
+def catalog() -> Catalog:
+    """
+    The catalog of the current dataset, rebuilt after the feature store changes.
+    """
+    global _catalog, _catalog_version
+    feature_store.sync()
+    with _lock:
+        if _catalog is None or _catalog_version != feature_store.version:
+            version = feature_store.version
+            entries = feature_store.products[['name', 'category']].dropna().drop_duplicates()
+            _catalog = Catalog(entries['name'].tolist(), entries['category'].tolist())
+            _catalog_version = version
+        return _catalog
@@ -0,0 +1,216 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from threading import Event, Lock
+from typing import Callable, Optional
+from app import metrics
+import time
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, reason: str = "deadline"):
+        super().__init__("Request cancelled" if reason == "cancelled" else "Request time budget exhausted")
+        self.reason = reason
+
+
+# At most this share of what is left of a budget is reserved for the work after a child deadline
+MAX_RESERVE_SHARE = 0.25
+
+
+class Deadline:
+    """
+    Time budget of a request, shared by everything working on it.
+
+    Work checks it between steps (check()), bounds its waits by it (timeout(), sleep())
+    and registers how to abort blocking calls (on_cancel()). cancel() ends the budget
+    early, e.g. when the client disconnects.
+
+    Example:
+        deadline = Deadline(60)
+        with use_deadline(deadline):
+            ...
+    """
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.event = Event()
+        self.callbacks = []
+        self.lock = Lock()
+
+    @contextmanager
+    def child(self, reserve: float = 0.0):
+        """
+        A deadline ending reserve seconds before this one, and cancelled with it while
+        the block runs. Leaves time for the work that follows, e.g. summarizing partial
+        tool results. Short budgets reserve at most MAX_RESERVE_SHARE of what is left,
+        so the child always gets most of it.
+        """
+        remaining = self.remaining()
+        child = Deadline(remaining - min(reserve, MAX_RESERVE_SHARE * remaining))
+        with self.on_cancel(child.cancel):
+            if self.cancelled:
+                child.cancel()
+            yield child
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() == 0
+
+    def check(self):
+        """
+        Raises DeadlineExceeded once the request was cancelled or ran out of time.
+        """
+        if self.cancelled:
+            raise DeadlineExceeded("cancelled")
+        if self.remaining() == 0:
+            raise DeadlineExceeded()
+
+    def timeout(self, seconds: float) -> float:
+        """
+        seconds, shortened to what is left of the budget.
+        """
+        self.check()
+        return min(seconds, self.remaining())
+
+    def sleep(self, seconds: float):
+        """
+        Sleeps like time.sleep(), but wakes up and raises as soon as the request is cancelled.
+        """
+        if self.event.wait(self.timeout(seconds)):
+            self.check()
+
+    def cancel(self):
+        with self.lock:
+            self.event.set()
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print("Cancellation callback failed:", e)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Calls callback if the request is cancelled while the block runs, e.g. driver.quit
+        to abort a page load blocked in another thread.
+        """
+        with self.lock:
+            self.callbacks.append(callback)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.callbacks.remove(callback)
+
+
+# The deadline of the request being handled; unbounded work sees None
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+# Tool calls run here so a stuck one can be abandoned when its budget runs out
+_tool_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="tool")
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]):
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def check():
+    deadline = current()
+    if deadline:
+        deadline.check()
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left for the current request, or None without a deadline.
+    """
+    deadline = current()
+    return deadline.remaining() if deadline else None
+
+
+def result(future):
+    """
+    future.result(), waiting no longer than the current request's deadline.
+    """
+    try:
+        return future.result(timeout=remaining())
+    except FutureTimeout:
+        check()
+        raise
+
+
+def timeout(seconds: float) -> float:
+    deadline = current()
+    return deadline.timeout(seconds) if deadline else seconds
+
+
+def sleep(seconds: float):
+    deadline = current()
+    if deadline:
+        deadline.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+@contextmanager
+def on_cancel(callback: Callable[[], None]):
+    deadline = current()
+    if deadline is None:
+        yield
+        return
+    with deadline.on_cancel(callback):
+        yield
+
+
+def _reason(deadline: Deadline) -> DeadlineExceeded:
+    return DeadlineExceeded("cancelled" if deadline.cancelled else "deadline")
+
+
+def bounded(stage: str, reserve: float = 0.0):
+    """
+    Decorator for tools: runs the call under the request's deadline, less reserve seconds,
+    and returns an error result instead of raising when it runs out or is cancelled.
+
+    The call is abandoned when the budget runs out even if it is stuck in a blocking call;
+    it stops at its next check. Without a request deadline the call runs as is.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            deadline = current()
+            if deadline is None:
+                return func(*args, **kwargs)
+
+            with deadline.child(reserve) as budget:
+                if budget.expired():
+                    metrics.inc("deadline_exceeded_total", stage=stage)
+                    return {"error": f"Skipped: {_reason(deadline)}"}
+
+                context = copy_context()
+                context.run(_current.set, budget)
+                future = _tool_executor.submit(context.run, func, *args, **kwargs)
+                try:
+                    return future.result(timeout=budget.remaining())
+                except (DeadlineExceeded, FutureTimeout):
+                    # Stops what the call registered with on_cancel(), e.g. its browser
+                    budget.cancel()
+                    metrics.inc("deadline_exceeded_total", stage=stage)
+                    return {"error": f"Timed out: {_reason(deadline)}"}
+        return wrapper
+    return decorator
@@ -0,0 +1,289 @@
+"""
+Materialized stock forecasts for every product, refreshed in the background.
+
+The table holds the forecast of every product for the FORECAST_HORIZON months after
+the latest complete month, stamped with the feature store version it was computed
+from. A scheduler thread in the app recomputes it on startup, every
+FORECAST_TABLE_INTERVAL seconds, and when the dataset changes. When several server
+workers share the file, a lease makes sure only one of them recomputes it.
+
+    python -m app.forecast_table --refresh
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+from app.models.feature_store import feature_store
+from app.models.windowing import FORECAST_HORIZON
+from app.tracing import span
+from app import metrics
+import argparse
+import sqlite3
+import time
+import os
+
+FORECAST_TABLE_PATH = os.getenv("FORECAST_TABLE_PATH", "app/models/forecast_table.db")
+
+# Seconds between scheduled refreshes, and between checks for a dataset change
+FORECAST_TABLE_INTERVAL = float(os.getenv("FORECAST_TABLE_INTERVAL", 6 * 3600))
+FORECAST_TABLE_POLL = float(os.getenv("FORECAST_TABLE_POLL", 30))
+
+# Set to false to serve live inference only, without the background refresh
+FORECAST_TABLE_ENABLED = os.getenv("FORECAST_TABLE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Products per model call during a refresh, which keeps its memory bounded
+REFRESH_CHUNK_SIZE = 64
+
+# Seconds a refresh holds its lease without renewing it (it renews after every chunk);
+# another worker takes over an expired lease, e.g. after a crash
+REFRESH_LEASE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    name TEXT NOT NULL,
+    month TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    PRIMARY KEY (name, month)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES
+    ('version', 0), ('dataset_version', -1), ('computed_at', NULL), ('refreshed_at', 0), ('lease_until', 0);
+"""
+
+
+class ForecastTable:
+    """
+    SQLite table of product -> month -> units, mirrored in memory for lookups.
+
+    Every refresh replaces the whole table in one transaction and bumps its version;
+    readers reload the in-memory copy when they see a new version.
+    """
+    def __init__(self, path: str = FORECAST_TABLE_PATH):
+        self.path = path
+        self.lock = Lock()
+        self.version = None
+        self.checked = 0.0
+        self.forecasts = {}
+        self.months = []
+        self.computed_at = None
+        self.dataset_version = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _meta(conn) -> dict:
+        return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self.checked < 1:
+            return
+        with self.lock:
+            self.checked = now
+            with self._connect() as conn:
+                meta = self._meta(conn)
+                if meta["version"] == self.version:
+                    return
+                rows = conn.execute("SELECT name, month, units FROM forecasts ORDER BY name, month").fetchall()
+
+            forecasts = {}
+            for name, month, units in rows:
+                forecasts.setdefault(name, {})[month] = units
+            self.forecasts = forecasts
+            self.months = sorted({month for _, month, _ in rows})
+            self.computed_at = meta["computed_at"]
+            self.dataset_version = meta["dataset_version"]
+            self.version = meta["version"]
+
+    def lookup(self, products: list[str], horizon: Optional[int] = None) -> Optional[dict]:
+        """
+        The materialized forecasts of products, or None when the table does not cover them.
+
+        Args:
+            products: Product names; names not in the dataset are skipped, as by live inference.
+            horizon: None for the next month only, else the number of months.
+
+        Returns:
+            dict: Like /predict_stock, product -> units (horizon None) or product -> month -> units.
+                  None when the table is empty, computed from an older dataset, shorter
+                  than horizon or lacks a product of the dataset (e.g. one added since the
+                  last refresh). computed_at tells when the forecasts were computed.
+        """
+        self._sync()
+        feature_store.sync()
+        months = self.months[:horizon or 1]
+        # Until the refresh after an ingest lands, live inference answers: the table's
+        # forecasts, and even its next month, may be out of date
+        stale = self.dataset_version != feature_store.version
+        if stale or not self.forecasts or len(months) < (horizon or 1):
+            metrics.inc("forecast_table_misses_total")
+            return None
+
+        known = None
+        result = {}
+        for product in products:
+            forecast = self.forecasts.get(product)
+            if forecast is None:
+                known = known or set(feature_store.product_names())
+                if product in known:
+                    metrics.inc("forecast_table_misses_total")
+                    return None
+                continue
+            result[product] = forecast[months[0]] if horizon is None else {month: forecast[month] for month in months}
+
+        metrics.inc("forecast_table_hits_total")
+        return result
+
+    def due(self) -> bool:
+        """
+        Whether the table is empty, older than FORECAST_TABLE_INTERVAL or computed from an
+        older dataset.
+        """
+        feature_store.sync()
+        with self._connect() as conn:
+            meta = self._meta(conn)
+        return meta["dataset_version"] != feature_store.version or \
+            time.time() - meta["refreshed_at"] > FORECAST_TABLE_INTERVAL
+
+    def _claim(self) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'lease_until' AND value < ?",
+                (now + REFRESH_LEASE_SECONDS, now)
+            ).rowcount
+        return claimed == 1
+
+    def _renew(self):
+        with self._connect() as conn:
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'lease_until'", (time.time() + REFRESH_LEASE_SECONDS,))
+
+    def _release(self):
+        with self._connect() as conn:
+            conn.execute("UPDATE meta SET value = 0 WHERE key = 'lease_until'")
+
+    def refresh(self, compute: Callable[[list[str], int], dict], horizon: int = FORECAST_HORIZON) -> bool:
+        """
+        Recomputes every product's forecast and replaces the table.
+
+        Args:
+            compute: Returns product -> month -> units for a list of product names and a horizon,
+                     e.g. stock_forecast_horizon.
+            horizon: Months to materialize.
+
+        Returns:
+            bool: False when another worker holds the refresh lease.
+        """
+        if not self._claim():
+            return False
+        try:
+            feature_store.sync()
+            dataset_version = feature_store.version
+            names = list(dict.fromkeys(feature_store.product_names()))
+
+            started = time.perf_counter()
+            rows = []
+            with span("forecast_table.refresh"):
+                for start in range(0, len(names), REFRESH_CHUNK_SIZE):
+                    forecasts = compute(names[start:start + REFRESH_CHUNK_SIZE], horizon)
+                    rows.extend(
+                        (name, month, int(units))
+                        for name, months in forecasts.items()
+                        for month, units in months.items()
+                    )
+                    self._renew()
+
+            computed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            with self._connect() as conn:
+                conn.execute("DELETE FROM forecasts")
+                conn.executemany("INSERT INTO forecasts (name, month, units) VALUES (?, ?, ?)", rows)
+                conn.executemany("UPDATE meta SET value = ? WHERE key = ?", [
+                    (dataset_version, "dataset_version"),
+                    (computed_at, "computed_at"),
+                    (time.time(), "refreshed_at")
+                ])
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+            metrics.inc("forecast_table_refreshes_total")
+            print(f"Materialized {len(rows)} forecasts of {len(names)} products in {time.perf_counter() - started:.1f}s")
+            return True
+        finally:
+            self._release()
+
+
+class ForecastScheduler:
+    """
+    Background thread keeping the forecast table current.
+
+    It checks every FORECAST_TABLE_POLL seconds (or right away after trigger()) whether
+    the table is due, and refreshes it when it is.
+    """
+    def __init__(self, table: ForecastTable, poll: float = FORECAST_TABLE_POLL):
+        self.table = table
+        self.poll = poll
+        self.wake = Event()
+        self.stopping = Event()
+        self.thread = None
+        self.compute = None
+
+    def start(self, compute: Callable[[list[str], int], dict]):
+        if self.thread is not None:
+            return
+        self.compute = compute
+        self.stopping.clear()
+        self.thread = Thread(target=self._run, name="forecast-table", daemon=True)
+        self.thread.start()
+
+    def trigger(self):
+        """
+        Checks the table now instead of at the next poll, e.g. after new data was ingested.
+        """
+        self.wake.set()
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                if self.table.due():
+                    self.table.refresh(self.compute)
+            except Exception as e:
+                metrics.inc("forecast_table_errors_total")
+                print("Forecast table refresh failed:", e)
+            self.wake.wait(self.poll)
+            self.wake.clear()
+
+
+forecast_table = ForecastTable()
+scheduler = ForecastScheduler(forecast_table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refresh", action="store_true", required=True)
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON)
+    args = parser.parse_args()
+
+    from app.routers.stock_forecast import stock_forecast_horizon
+    if not forecast_table.refresh(stock_forecast_horizon, args.horizon):
+        print("Another process is refreshing the table")
@@ -0,0 +1,192 @@
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+
+# Mean Earth radius (IUGG) and the WGS-84 ellipsoid, as used by geopy
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# kg CO₂ per km travelled: per passenger for air and rail, per vehicle for road,
+# and per tonne of cargo for sea
+EMISSION_FACTORS = {
+    "air": 0.09,
+    "rail": 0.041,
+    "road": 0.192,
+    "sea": 0.02
+}
+
+# Stations, airports and ports the tools are usually called with, by mode: code -> (lat, lng).
+# The modes have their own codes, which overlap: CDG is Chandigarh station but Paris's airport
+HUBS = {
+    "rail": {
+        "PUNE": (18.5286, 73.8743),
+        "NDLS": (28.6430, 77.2190),
+        "LTT": (19.0700, 72.8920),
+        "ST": (21.2050, 72.8410),
+        "HWH": (22.5830, 88.3420),
+        "MAS": (13.0827, 80.2757),
+        "BRC": (22.3106, 73.1810),
+        "CDG": (30.7046, 76.8206),
+        "ADI": (23.0258, 72.6010),
+        "SBC": (12.9781, 77.5697),
+    },
+    "air": {
+        "BOM": (19.0896, 72.8656),
+        "DEL": (28.5562, 77.1000),
+        "PNQ": (18.5822, 73.9197),
+        "BLR": (13.1986, 77.7066),
+        "MAA": (12.9941, 80.1709),
+        "CCU": (22.6547, 88.4467),
+        "AMD": (23.0772, 72.6347),
+        "STV": (21.1141, 72.7418),
+        "BDQ": (22.3362, 73.2263),
+        "IXC": (30.6735, 76.7885),
+    },
+    "sea": {
+        "INBOM": (18.9400, 72.8400),
+        "INNSA": (18.9500, 72.9500),
+        "INMUN": (22.7400, 69.7000),
+        "INCCU": (22.5500, 88.3100),
+        "INMAA": (13.1000, 80.3000),
+    },
+}
+
+# The codes of HUBS by kind
+STATIONS = tuple(HUBS["rail"])
+AIRPORTS = tuple(HUBS["air"])
+PORTS = tuple(HUBS["sea"])
+
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Great-circle distance on a sphere, broadcast over arrays of coordinates in degrees.
+    Within ~0.5% of the ellipsoidal distance; use vincenty_km() where that matters.
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def vincenty_km(lat1, lng1, lat2, lng2, iterations: int = 200, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Distance on the WGS-84 ellipsoid (Vincenty's inverse formula), broadcast over arrays of
+    coordinates in degrees. Agrees with geopy's geodesic() to well under a metre.
+
+    Nearly antipodal pairs, where the iteration does not converge, fall back to haversine_km().
+    """
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lng1, lat2, lng2)))
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    lng = np.radians(lng2 - lng1)
+
+    lam = lng.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    for _ in range(iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+        c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        previous = lam
+        lam = lng + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        converged = np.abs(lam - previous) < tolerance
+        if converged.all():
+            break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    distance = WGS84_B * a * (sigma - delta_sigma)
+
+    return np.where(converged, distance, haversine_km(lat1, lng1, lat2, lng2))
+
+
+def distance_km(src_coords: tuple, dst_coords: tuple) -> float:
+    """
+    Ellipsoidal distance between two (lat, lng) points, rounded to 2 decimals.
+    """
+    return round(float(vincenty_km(src_coords[0], src_coords[1], dst_coords[0], dst_coords[1])), 2)
+
+
+def pairwise_km(coords: np.ndarray, others: Optional[np.ndarray] = None, method=vincenty_km) -> np.ndarray:
+    """
+    Distances between every row of coords and every row of others (default coords).
+
+    Args:
+        coords: (n, 2) array of (lat, lng).
+        others: (m, 2) array of (lat, lng).
+        method: vincenty_km or haversine_km.
+
+    Returns:
+        np.ndarray: (n, m) distances in km.
+    """
+    coords = np.asarray(coords, dtype=float)
+    others = coords if others is None else np.asarray(others, dtype=float)
+    return method(coords[:, None, 0], coords[:, None, 1], others[None, :, 0], others[None, :, 1])
+
+
+@lru_cache
+def hub_distances(mode: str) -> tuple:
+    """
+    The pairwise distance matrix of the hubs of a mode, computed once.
+
+    Returns:
+        tuple: (codes, matrix) where matrix[i, j] is the distance in km between codes[i] and codes[j].
+    """
+    codes = list(HUBS[mode])
+    matrix = pairwise_km(np.array([HUBS[mode][code] for code in codes]))
+    matrix.setflags(write=False)
+    return codes, matrix
+
+
+def hub_distance_km(mode: str, src: str, dst: str) -> Optional[float]:
+    """
+    Distance between two hub codes of a mode from the cached matrix, or None for a code
+    that is not a hub of that mode.
+    """
+    codes, matrix = hub_distances(mode)
+    try:
+        return round(float(matrix[codes.index(src.upper()), codes.index(dst.upper())]), 2)
+    except ValueError:
+        return None
+
+
+def leg_distance_km(mode: str, src: str, dst: str, src_coords: tuple, dst_coords: tuple) -> float:
+    """
+    Distance of a leg between two codes of a mode: from the hub matrix when both are hubs
+    of that mode, from the given (lat, lng) coordinates otherwise.
+    """
+    distance = hub_distance_km(mode, src, dst)
+    return distance_km(src_coords, dst_coords) if distance is None else distance
+
+
+def emission_kg(mode: str, distance, tonnage=1.0):
+    """
+    CO₂ emitted over distance (km, scalar or array) by mode.
+
+    Args:
+        mode: 'air', 'rail', 'road' or 'sea'.
+        distance: Distance in km.
+        tonnage: Cargo in tonnes; only sea emissions scale with it (tonne-km).
+
+    Returns:
+        Emissions in kg, rounded to 2 decimals, with the shape of distance.
+    """
+    if mode not in EMISSION_FACTORS:
+        raise ValueError(f"Unknown transport mode: {mode}, expected one of {list(EMISSION_FACTORS)}")
+    factor = EMISSION_FACTORS[mode] * (tonnage if mode == "sea" else 1.0)
+    emission = np.round(np.asarray(distance, dtype=float) * factor, 2)
+    return float(emission) if emission.ndim == 0 else emission
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from app.supervisor import supervisor
+from app import metrics
+import contextvars
+import asyncio
+import time
+import os
+
+# TensorFlow and Prophet release the GIL in their native code, so a small thread pool
+# keeps the cores busy without oversubscribing them
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 8))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", 5))
+
+
+class InferenceQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full, retry later")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound model work on its own thread pool, away from the anyio threadpool
+    that serves the other sync routes.
+
+    At most workers + queue_size jobs are admitted at once; further submissions fail
+    immediately with InferenceQueueFull instead of queueing up latency.
+    """
+    def __init__(self, workers: int, queue_size: int, retry_after: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.slots = BoundedSemaphore(workers + queue_size)
+        self.retry_after = retry_after
+
+    def _release(self, _):
+        self.slots.release()
+
+    async def run(self, func, *args):
+        # Above the memory ceiling, once scraping is shed, model work is refused too
+        if supervisor.over_ceiling:
+            metrics.inc("supervisor_shed_total", stage="inference")
+            raise InferenceQueueFull(self.retry_after)
+        if not self.slots.acquire(blocking=False):
+            metrics.inc("inference_rejected_total")
+            raise InferenceQueueFull(self.retry_after)
+
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+
+        def job():
+            metrics.observe("inference_queue_wait_seconds", time.perf_counter() - submitted)
+            return context.run(func, *args)
+
+        try:
+            future = self.executor.submit(job)
+        except BaseException:
+            self.slots.release()
+            raise
+
+        # The slot is freed when the job finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+
+executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_RETRY_AFTER)
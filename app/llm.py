@@ -0,0 +1,273 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from concurrent.futures import Future
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable, Optional
+from app import metrics, deadline
+from app.tracing import span
+import asyncio
+import hashlib
+import random
+import copy
+import json
+import time
+import os
+
+# "live" talks to the providers, "fake" answers from set_fake_responder() for offline runs
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 16))
+
+PROVIDERS = {
+    "openai": {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "requests_per_second": float(os.getenv("OPENAI_REQUESTS_PER_SECOND", 5)),
+        "burst": float(os.getenv("OPENAI_BURST", 10))
+    },
+    "google": {
+        "model": os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+        "requests_per_second": float(os.getenv("GEMINI_REQUESTS_PER_SECOND", 2)),
+        "burst": float(os.getenv("GEMINI_BURST", 5))
+    }
+}
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = ("RateLimit", "ResourceExhausted", "ServiceUnavailable", "Timeout", "APIConnectionError", "InternalServerError")
+
+_sync_lock = Lock()
+_sync_inflight: dict[str, Future] = {}
+_async_inflight: dict[str, asyncio.Future] = {}
+
+
+def _default_fake_responder(messages: list[BaseMessage], **kwargs) -> AIMessage:
+    return AIMessage(content=str(messages[-1].content) if messages else "")
+
+
+_fake_responder: Callable[..., Any] = _default_fake_responder
+
+
+def set_fake_responder(responder: Optional[Callable[..., Any]] = None):
+    """
+    Sets the function answering fake-backend calls, or restores the echo responder.
+
+    The responder receives the messages and the call kwargs (e.g. 'tools', 'tool_choice')
+    and returns an AIMessage or a string.
+    """
+    global _fake_responder
+    _fake_responder = responder or _default_fake_responder
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model used when LLM_BACKEND=fake.
+    """
+    model: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = _fake_responder(messages, **kwargs)
+        if isinstance(message, str):
+            message = AIMessage(content=message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    return any(name in type(error).__name__ for name in RETRYABLE_ERRORS)
+
+
+def _backoff(attempt: int) -> float:
+    return min(LLM_BACKOFF_BASE * 2 ** attempt, LLM_BACKOFF_MAX) * random.uniform(0.5, 1)
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Chat model that sends every call of a provider through one shared client.
+
+    Calls wait on the provider's token bucket, identical in-flight prompts are answered by
+    a single request, retryable errors are retried with jittered exponential backoff, and
+    latency and token usage are recorded per call.
+    """
+    provider: str
+    inner: BaseChatModel
+    limiter: InMemoryRateLimiter
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.provider}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"provider": self.provider, "model": _model_name(self.inner)}
+
+    def bind_tools(self, tools, **kwargs):
+        # Let the provider format the tools, but keep calls going through the gateway
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+    def _key(self, messages, stop, kwargs) -> str:
+        payload = json.dumps(
+            [[m.model_dump(exclude={"id"}) for m in messages], stop, kwargs, _model_name(self.inner)],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _record(self, result: ChatResult, elapsed: float):
+        model = _model_name(self.inner)
+        metrics.inc("llm_requests_total", provider=self.provider, model=model)
+        metrics.observe("llm_latency_seconds", elapsed, provider=self.provider, model=model)
+
+        usage = getattr(result.generations[0].message, "usage_metadata", None) or {}
+        for kind in ("input_tokens", "output_tokens"):
+            if usage.get(kind):
+                metrics.inc("llm_tokens_total", usage[kind], provider=self.provider, model=model, kind=kind)
+
+    def _failed(self, error: Exception, attempt: int) -> bool:
+        metrics.inc("llm_errors_total", provider=self.provider, error=type(error).__name__)
+        if attempt == LLM_MAX_RETRIES or not _is_retryable(error):
+            return True
+        metrics.inc("llm_retries_total", provider=self.provider)
+        return False
+
+    def _call(self, messages, stop, kwargs) -> ChatResult:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.limiter.acquire()
+            # Do not start (or retry) a call the request no longer has time for
+            deadline.check()
+            start = time.perf_counter()
+            try:
+                with span(f"llm.{self.provider}"):
+                    result = self.inner._generate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                if self._failed(e, attempt):
+                    raise
+                deadline.sleep(_backoff(attempt))
+                continue
+            self._record(result, time.perf_counter() - start)
+            return result
+
+    async def _acall(self, messages, stop, kwargs) -> ChatResult:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.limiter.aacquire()
+            start = time.perf_counter()
+            try:
+                with span(f"llm.{self.provider}"):
+                    result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                if self._failed(e, attempt):
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            self._record(result, time.perf_counter() - start)
+            return result
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        with _sync_lock:
+            future = _sync_inflight.get(key)
+            leader = future is None
+            if leader:
+                future = _sync_inflight[key] = Future()
+
+        if not leader:
+            metrics.inc("llm_coalesced_total", provider=self.provider)
+            return copy.deepcopy(deadline.result(future))
+
+        try:
+            result = self._call(messages, stop, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _sync_lock:
+                _sync_inflight.pop(key, None)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        future = _async_inflight.get(key)
+        if future is not None:
+            metrics.inc("llm_coalesced_total", provider=self.provider)
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = _async_inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._acall(messages, stop, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            _async_inflight.pop(key, None)
+
+
+def _model_name(model: BaseChatModel) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or "unknown"
+
+
+def _client(provider: str, model: str) -> BaseChatModel:
+    if LLM_BACKEND == "fake":
+        return FakeChatModel(model=model)
+
+    # Retries are handled by the gateway
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, max_retries=0)
+    if provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            max_retries=0
+        )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+@lru_cache(maxsize=None)
+def _limiter(provider: str) -> InMemoryRateLimiter:
+    settings = PROVIDERS[provider]
+    return InMemoryRateLimiter(
+        requests_per_second=settings["requests_per_second"],
+        max_bucket_size=settings["burst"]
+    )
+
+
+@lru_cache(maxsize=None)
+def chat_model(provider: str, model: Optional[str] = None) -> GatewayChatModel:
+    """
+    Returns the shared gateway client for a provider.
+
+    Args:
+        provider: "openai" or "google".
+        model: Model name, defaults to the provider's configured model.
+
+    Returns:
+        GatewayChatModel: The same instance for every caller asking for this provider and model.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    return GatewayChatModel(
+        provider=provider,
+        inner=_client(provider, model or PROVIDERS[provider]["model"]),
+        limiter=_limiter(provider)
+    )
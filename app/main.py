@@ -2,7 +2,33 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from app.responses import OrjsonResponse
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from app.tracing import TimingMiddleware
+from app.forecast_table import scheduler, FORECAST_TABLE_ENABLED
+from app.supervisor import supervisor, MemoryMiddleware
+import os
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# Responses smaller than this (bytes) are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reaps leaked browsers and enforces the memory ceiling
+    supervisor.start()
+    # Materializes the stock forecasts now, then keeps them current in the background
+    if FORECAST_TABLE_ENABLED:
+        scheduler.start(stock_forecast.stock_forecast_horizon)
+    yield
+    scheduler.stop()
+    supervisor.stop()
 
 # Create FastAPI app
 app = FastAPI(
@@ -11,6 +37,8 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -24,10 +52,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.routers import route_optimizer, stock_forecast, products, bot, resource_optimizer
+# Brotli when installed (falling back to gzip for clients without it), gzip otherwise
+if BrotliMiddleware:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+app.add_middleware(TimingMiddleware)
+app.add_middleware(MemoryMiddleware)
+
+from app.routers import route_optimizer, stock_forecast, products, bot, resource_optimizer, metrics, dataset
 
 app.include_router(stock_forecast.router)
 app.include_router(products.router)
 app.include_router(route_optimizer.router)
 app.include_router(bot.router)
-app.include_router(resource_optimizer.router)
\ No newline at end of file
+app.include_router(resource_optimizer.router)
+app.include_router(metrics.router)
+app.include_router(dataset.router)
\ No newline at end of file
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from threading import Lock
+import bisect
+import math
+
+# Upper bounds (seconds) of the histogram buckets, +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = Lock()
+_counters = defaultdict(float)
+_histograms = {}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    """
+    Adds value to the counter identified by name and labels.
+
+    Example: inc("structured_output_calls_total", call="summarizer")
+    """
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name: str, value: float, buckets: tuple = BUCKETS, **labels):
+    """
+    Records one observation (e.g. a latency in seconds) in the histogram for name and labels.
+    buckets are the upper bounds of its buckets, for values that are not latencies.
+    """
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(buckets) + 1), 0, 0.0, buckets]
+        histogram[0][bisect.bisect_left(histogram[3], value)] += 1
+        histogram[1] += 1
+        histogram[2] += value
+
+
+def counter_value(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get(_key(name, labels), 0.0)
+
+
+def snapshot() -> dict:
+    """
+    Returns a copy of every counter, keyed by name and then by its label tuple.
+    Histograms are reported as {"count": ..., "sum": ...}.
+    """
+    out = defaultdict(dict)
+    with _lock:
+        for (name, labels), value in _counters.items():
+            out[name][labels] = value
+        for (name, labels), (_, count, total, _) in _histograms.items():
+            out[name][labels] = {"count": count, "sum": total}
+    return dict(out)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra: tuple = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*labels, *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render() -> str:
+    """
+    Renders every counter and histogram in the Prometheus text exposition format.
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(counts), count, total, bounds)) for key, (counts, count, total, bounds) in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    for (name, labels), (counts, count, total, bounds) in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, bucket in zip((*bounds, math.inf), counts):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_labels(labels, (('le', _number(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,383 @@
+from contextlib import contextmanager
+from datetime import datetime
+from threading import RLock
+import pandas as pd
+import numpy as np
+import sqlite3
+import joblib
+import time
+import re
+import os
+
+DATASET_PATH = 'app/models/dataset.csv'
+ENCODER_PATH = 'app/models/encoder.pkl'
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH", "app/models/features.db")
+
+# Seconds between checks for changes written by other processes (e.g. other server workers)
+FEATURE_STORE_SYNC_INTERVAL = float(os.getenv("FEATURE_STORE_SYNC_INTERVAL", 1))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name_code REAL NOT NULL,
+    category_code REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    month TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    value,
+    code REAL,
+    PRIMARY KEY (product_id, month, feature)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+
+def parse_column(column: str):
+    """
+    Splits a wide dataset column into (feature, month), e.g.
+    'Stocks Required-2024-01-01' and 'Seasonality-Jan-2024,' both give month '2024-01-01'.
+    Returns None for columns without a month.
+    """
+    match = re.match(r"^(.*)-(\d{4}-\d{2}-\d{2})$", column)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.match(r"^(.*)-([A-Z][a-z]{2}-\d{4}),?$", column)
+    if match:
+        return match.group(1), datetime.strptime(match.group(2), "%b-%Y").strftime("%Y-%m-01")
+    return None
+
+
+def column_name(feature: str, month: str) -> str:
+    return f"{feature}-{month}"
+
+
+class FeatureStore:
+    """
+    Long-format (product, month, feature) store behind the wide dataset.
+
+    Observations live in SQLite with their raw value and their encoded value, so new data
+    only needs its own rows encoded. An in-memory (products x months x features) cube of
+    encoded values serves model inputs, and the wide frame is rebuilt only after a change.
+    The database is seeded from dataset.csv the first time it is opened.
+
+    Every write bumps a version stamp in the database; processes sharing the file reload
+    their cube when they see a newer one (at most every FEATURE_STORE_SYNC_INTERVAL seconds).
+    """
+    def __init__(self, path: str = FEATURE_STORE_PATH, csv_path: str = DATASET_PATH):
+        self.path = path
+        self.csv_path = csv_path
+        self.lock = RLock()
+        self.loaded = False
+        self.version = 0
+        self.checked = 0.0
+        self._frame = None
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _load_categories(self):
+        encoder = joblib.load(ENCODER_PATH)
+        names = list(encoder.feature_names_in_)
+        self.name_codes = {value: code for code, value in enumerate(encoder.categories_[names.index('Product Name')])}
+        self.category_codes = {value: code for code, value in enumerate(encoder.categories_[names.index('Product Category')])}
+
+        # Every month of a feature shares its categories; the latest month's encoding is used
+        self.feature_codes = {}
+        for name, categories in zip(names, encoder.categories_):
+            parsed = parse_column(name)
+            if parsed:
+                self.feature_codes[parsed[0]] = {value: code for code, value in enumerate(categories)}
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            self._load_categories()
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+                if conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
+                    self._seed(conn)
+                products = pd.read_sql("SELECT * FROM products ORDER BY id", conn)
+                long = pd.read_sql("SELECT product_id, month, feature, code FROM observations", conn)
+                feature_order = pd.read_sql("SELECT feature FROM observations WHERE rowid IN (SELECT MIN(rowid) FROM observations GROUP BY feature) ORDER BY rowid", conn)
+                version = self._stored_version(conn)
+
+            self.products = products
+            self.features = feature_order['feature'].tolist()
+            self.months = sorted(long['month'].unique())
+            self.codes = np.full((len(products), len(self.months), len(self.features)), np.nan, dtype=np.float32)
+            self._assign(long)
+            self._frame = None
+            self.version = version
+            self.checked = time.monotonic()
+            self.loaded = True
+
+    @staticmethod
+    def _stored_version(conn) -> int:
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def sync(self, force: bool = False):
+        """
+        Loads the store, and reloads it when another process has written to the database
+        since it was loaded.
+        """
+        self.load()
+        now = time.monotonic()
+        if not force and now - self.checked < FEATURE_STORE_SYNC_INTERVAL:
+            return
+        with self.lock:
+            self.checked = now
+            with self._connect() as conn:
+                stale = self._stored_version(conn) != self.version
+            if stale:
+                self.loaded = False
+                self.load()
+
+    def _seed(self, conn):
+        data = pd.read_csv(self.csv_path).rename_axis('id').reset_index()
+
+        products = data[['id', 'Product Name', 'Product Category']].rename(
+            columns={'Product Name': 'name', 'Product Category': 'category'}
+        )
+        products['name_code'] = products['name'].map(self.name_codes)
+        products['category_code'] = products['category'].map(self.category_codes)
+
+        long = data.drop(columns=['Product Name', 'Product Category']).melt(
+            id_vars='id', var_name='column', value_name='value'
+        )
+        parsed = pd.DataFrame(long['column'].map(parse_column).tolist(), columns=['feature', 'month'])
+        long = pd.concat([long[['id', 'value']].rename(columns={'id': 'product_id'}), parsed], axis=1)
+        long['code'] = self._encode(long)
+
+        products.to_sql('products', conn, if_exists='append', index=False)
+        conn.executemany(
+            "INSERT INTO observations (product_id, month, feature, value, code) VALUES (?, ?, ?, ?, ?)",
+            long[['product_id', 'month', 'feature', 'value', 'code']].itertuples(index=False, name=None)
+        )
+
+    def _encode(self, long: pd.DataFrame) -> pd.Series:
+        codes = pd.Series(np.nan, index=long.index)
+        for feature, rows in long.groupby('feature').groups.items():
+            values = long.loc[rows, 'value']
+            if feature in self.feature_codes:
+                encoded = values.map(self.feature_codes[feature])
+                unknown = values[encoded.isna()]
+                if len(unknown):
+                    raise ValueError(f"Unknown {feature} value(s): {sorted(set(map(str, unknown)))}")
+            else:
+                encoded = pd.to_numeric(values, errors='raise')
+            codes[rows] = encoded.astype(float)
+        return codes
+
+    def _assign(self, long: pd.DataFrame):
+        product_index = pd.Index(self.products['id']).get_indexer(long['product_id'])
+        month_index = pd.Index(self.months).get_indexer(long['month'])
+        feature_index = pd.Index(self.features).get_indexer(long['feature'])
+        self.codes[product_index, month_index, feature_index] = long['code'].to_numpy(dtype=np.float32)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Returns the raw data in the wide layout: one row per product, 'Product Name',
+        'Product Category', then one '<feature>-<YYYY-MM-01>' column per feature and month.
+        """
+        self.sync()
+        with self.lock:
+            if self._frame is not None:
+                return self._frame
+
+            with self._connect() as conn:
+                long = pd.read_sql("SELECT product_id, month, feature, value FROM observations", conn)
+            wide = long.pivot(index='product_id', columns=['feature', 'month'], values='value')
+            wide = wide.reindex(
+                columns=pd.MultiIndex.from_product([self.features, self.months]),
+                index=self.products['id']
+            )
+            numeric = {column_name(feature, month): float for feature, month in wide.columns if feature not in self.feature_codes}
+            wide.columns = [column_name(feature, month) for feature, month in wide.columns]
+            wide = wide.astype(numeric)
+            frame = pd.concat([
+                self.products[['name', 'category']].rename(columns={'name': 'Product Name', 'category': 'Product Category'}),
+                wide.reset_index(drop=True)
+            ], axis=1)
+
+            self._frame = frame
+            return frame
+
+    def product_names(self) -> list[str]:
+        self.sync()
+        return self.products['name'].tolist()
+
+    def latest_month(self, feature: str) -> str:
+        """
+        The latest month every product has a value of feature for, or the latest month
+        in the store when no month is complete.
+        """
+        self.sync()
+        with self.lock:
+            known = ~np.isnan(self.codes[:, :, self.features.index(feature)])
+            complete = np.flatnonzero(known.all(axis=0))
+            return self.months[complete[-1]] if len(complete) else self.months[-1]
+
+    def window(self, products: list[str], months: list[str], features: list[str]):
+        """
+        Encoded model inputs for every row whose name is in products.
+
+        Gaps in a product's history are filled from the nearest earlier month, then the nearest later one.
+
+        Returns:
+            tuple: (rows, codes) where rows is a DataFrame of the selected products (id, name,
+                   category, name_code, category_code) and codes has shape
+                   (len(rows), len(months), len(features)).
+        """
+        self.sync()
+        with self.lock:
+            selected = self.products['name'].isin(products).to_numpy()
+            rows = self.products[selected].reset_index(drop=True)
+
+            month_index = pd.Index(self.months).get_indexer(months)
+            feature_index = pd.Index(self.features).get_indexer(features)
+            if (month_index < 0).any():
+                raise ValueError(f"Months not in the dataset: {[m for m, i in zip(months, month_index) if i < 0]}")
+            if (feature_index < 0).any():
+                raise ValueError(f"Unknown features: {[f for f, i in zip(features, feature_index) if i < 0]}")
+
+            codes = self.codes[selected][:, month_index][:, :, feature_index]
+
+        if np.isnan(codes).any():
+            codes = codes.copy()
+            filled = pd.DataFrame(codes.transpose(1, 0, 2).reshape(len(months), -1)).ffill().bfill()
+            codes = filled.to_numpy(dtype=np.float32).reshape(len(months), len(rows), len(features)).transpose(1, 0, 2)
+
+        return rows, codes
+
+    def _resolve(self, conn, records: list[dict]) -> list[int]:
+        ids = []
+        next_id = int(self.products['id'].max()) + 1 if len(self.products) else 0
+        next_name_code = max(float(self.products['name_code'].max()) + 1 if len(self.products) else 0, len(self.name_codes))
+        created = {}
+
+        for record in records:
+            if record.get('product_id') is not None:
+                if record['product_id'] not in set(self.products['id']):
+                    raise ValueError(f"Unknown product_id: {record['product_id']}")
+                ids.append(record['product_id'])
+                continue
+
+            key = (record['name'], record['category'])
+            if key in created:
+                ids.append(created[key])
+                continue
+
+            matches = self.products[(self.products['name'] == key[0]) & (self.products['category'] == key[1])]
+            if len(matches) > 1:
+                raise ValueError(f"{key[0]} ({key[1]}) matches several products, pass product_id")
+            if len(matches) == 1:
+                ids.append(int(matches['id'].iloc[0]))
+                continue
+
+            if key[1] not in self.category_codes:
+                raise ValueError(f"Unknown Product Category: {key[1]}")
+            known = self.products[self.products['name'] == key[0]]
+            if len(known):
+                name_code = float(known['name_code'].iloc[0])
+            elif key[0] in self.name_codes:
+                name_code = float(self.name_codes[key[0]])
+            else:
+                name_code, next_name_code = next_name_code, next_name_code + 1
+
+            conn.execute(
+                "INSERT INTO products (id, name, category, name_code, category_code) VALUES (?, ?, ?, ?, ?)",
+                (next_id, key[0], key[1], name_code, float(self.category_codes[key[1]]))
+            )
+            created[key] = next_id
+            ids.append(next_id)
+            next_id += 1
+
+        return ids
+
+    def upsert(self, records: list[dict]) -> dict:
+        """
+        Inserts or replaces observations, adding products and months as needed.
+
+        Args:
+            records: One dict per product and month:
+                     {"product_id": 3 (optional), "name": "Maggi", "category": "Foods and Beverages",
+                      "month": "2025-01-01", "features": {"Stocks Required": 320, "Seasonality": "good", ...}}
+                     Without product_id, the product is matched on name and category, and created
+                     when there is no match.
+
+        Returns:
+            dict: {"products": [ids of the affected products], "months": [affected months],
+                   "observations": number of observations written}
+
+        Raises:
+            ValueError: On unknown features, categories or product ids, or an ambiguous name.
+        """
+        self.sync(force=True)
+        with self.lock:
+            for record in records:
+                unknown = set(record['features']) - set(self.features)
+                if unknown:
+                    raise ValueError(f"Unknown features: {sorted(unknown)}")
+
+            with self._connect() as conn:
+                ids = self._resolve(conn, records)
+                long = pd.DataFrame([
+                    {'product_id': product_id, 'month': record['month'], 'feature': feature, 'value': value}
+                    for product_id, record in zip(ids, records)
+                    for feature, value in record['features'].items()
+                ], columns=['product_id', 'month', 'feature', 'value'])
+                long['code'] = self._encode(long)
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO observations (product_id, month, feature, value, code) VALUES (?, ?, ?, ?, ?)",
+                    long[['product_id', 'month', 'feature', 'value', 'code']].itertuples(index=False, name=None)
+                )
+                products = pd.read_sql("SELECT * FROM products ORDER BY id", conn)
+                # Another process may have written since the sync above
+                concurrent = self._stored_version(conn) != self.version
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+                version = self._stored_version(conn)
+
+            if concurrent:
+                self.loaded = False
+                self.load()
+            else:
+                self._grow(products, sorted(set(self.months) | set(long['month'])))
+                self._assign(long)
+                self._frame = None
+                self.version = version
+
+        return {
+            "products": sorted(set(ids)),
+            "months": sorted(set(long['month'])),
+            "observations": len(long)
+        }
+
+    def _grow(self, products: pd.DataFrame, months: list[str]):
+        if len(products) == len(self.products) and months == self.months:
+            return
+        codes = np.full((len(products), len(months), len(self.features)), np.nan, dtype=np.float32)
+        month_index = pd.Index(months).get_indexer(self.months)
+        codes[:len(self.products)][:, month_index] = self.codes
+        self.products, self.months, self.codes = products, months, codes
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,98 @@
+from threading import Lock
+import numpy as np
+import tempfile
+import hashlib
+import json
+import time
+import os
+
+FORECAST_STORE_PATH = os.getenv("FORECAST_STORE_PATH", "app/models/prophet_forecasts.json")
+
+# How often (seconds) the store checks whether the file on disk was replaced
+RELOAD_INTERVAL = 5
+
+
+def forecast_key(dates, y, prediction_date, columns) -> str:
+    """
+    Identifies a Prophet fit by its history, prediction date and output columns.
+
+    The history is hashed as float32, which is what the model feeds the Prophet layer.
+    """
+    digest = hashlib.sha1(np.asarray(y, dtype=np.float32).tobytes())
+    digest.update(json.dumps([list(dates), prediction_date, list(columns)]).encode())
+    return digest.hexdigest()
+
+
+class ForecastStore:
+    """
+    Prophet outputs keyed by forecast_key(), persisted as one JSON file.
+
+    The file is only ever replaced atomically, so readers see either the old or the new
+    set of forecasts. Entries added with put() live in memory until the next write().
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.mtime = None
+        self.checked = 0.0
+        self.lock = Lock()
+
+    def _reload(self):
+        now = time.monotonic()
+        if now - self.checked < RELOAD_INTERVAL:
+            return
+        self.checked = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self.mtime:
+            return
+
+        with open(self.path) as f:
+            entries = json.load(f)["entries"]
+        with self.lock:
+            self.entries = entries
+            self.mtime = mtime
+
+    def get(self, key: str):
+        self._reload()
+        return self.entries.get(key)
+
+    def put(self, key: str, values):
+        with self.lock:
+            self.entries[key] = np.asarray(values, dtype=float).tolist()
+
+    def retain(self, keys) -> int:
+        """
+        Drops every in-memory entry whose key is not in keys and returns how many were dropped.
+        """
+        self._reload()
+        keys = set(keys)
+        with self.lock:
+            stale = [key for key in self.entries if key not in keys]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+
+    def write(self, entries: dict):
+        """
+        Atomically replaces the stored forecasts with entries.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".forecasts-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"written_at": time.time(), "entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        with self.lock:
+            self.entries = dict(entries)
+            self.mtime = os.stat(self.path).st_mtime
+
+
+store = ForecastStore(FORECAST_STORE_PATH)
@@ -1,15 +1,19 @@
-import joblib
 import tensorflow as tf
-from tensorflow.keras.models import load_model
+from tensorflow.keras.models import load_model, Model
 from tensorflow.keras.utils import CustomObjectScope
 from app.models.prophet_model import ProphetModel
 from app.models.lstm_cnn_hybrid_model import LSTMAndCNN4StockForecasting
 
-with open('app/models/encoder.pkl', 'rb') as f:
-    encoder = joblib.load(f)
-
 with CustomObjectScope({
     'ProphetModel': ProphetModel,
     'LSTMAndCNN4StockForecasting': LSTMAndCNN4StockForecasting
 }):
     model = load_model('app/models/ulip_model_stock_forecasting.h5')
+
+# The same network taking the Prophet layer's outputs as an input, so Prophet can be run
+# outside the graph for any window and several prediction dates
+prophet_layer = next(layer for layer in model.layers if isinstance(layer, ProphetModel))
+head = Model(
+    [prophet_layer.output] + [tensor for tensor in model.inputs if tensor is not prophet_layer.input],
+    model.output
+)
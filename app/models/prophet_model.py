@@ -1,6 +1,5 @@
-from prophet import Prophet
+from app.models.prophet_refresh import prophet_forecasts
 import tensorflow as tf
-import pandas as pd
 import numpy as np
 from tensorflow.keras.layers import Layer
 
@@ -10,19 +9,10 @@ class ProphetModel(Layer):
         self.dates = dates
         self.prediction_date = prediction_date
         self.output_columns_selection = output_columns_selection
-        self.ds = pd.DataFrame(self.dates, columns=['ds'])
 
     def get_prediction_from_prophet_model(self, inst):
         y = np.array(inst)
-        y = pd.DataFrame(y, columns=['y'])
-        inp = pd.concat([self.ds, y], axis=1)
-        model = Prophet()
-        model.fit(inp)
-        pred_inp = pd.DataFrame([self.prediction_date], columns=['ds'])
-        out = model.predict(pred_inp)
-        out = out[self.output_columns_selection]
-        out = np.array(out)
-        return out
+        return prophet_forecasts([y], self.dates, [self.prediction_date], self.output_columns_selection)[0]
 
     def call(self, inputs):
         def get_prediction(inst):
@@ -0,0 +1,179 @@
+"""
+Recomputes the Prophet forecasts for every product in the dataset in parallel.
+
+    python -m app.models.prophet_refresh --workers 4
+
+This module must not import TensorFlow: it is imported by every worker process.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.models.forecast_store import ForecastStore, forecast_key, store
+from app.models.feature_store import feature_store
+from app.models.windowing import prophet_config, window_months, prediction_dates, FORECAST_HORIZON
+from prophet import Prophet
+from typing import Callable, Optional
+import multiprocessing
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import time
+import os
+
+DATASET_PATH = 'app/models/dataset.csv'
+
+
+def quiet_stan():
+    # cmdstanpy configures its logger on first use, so a level set here would be overridden
+    logging.getLogger("cmdstanpy").disabled = True
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+
+
+def fit_prophet(dates, y, prediction_dates, columns) -> np.ndarray:
+    """
+    Fits Prophet on a monthly history once and predicts every one of prediction_dates.
+
+    Returns:
+        np.ndarray: Shape (len(prediction_dates), len(columns)).
+    """
+    if isinstance(prediction_dates, str):
+        prediction_dates = [prediction_dates]
+    inp = pd.DataFrame({'ds': dates, 'y': np.asarray(y, dtype=float)})
+    model = Prophet()
+    model.fit(inp)
+    out = model.predict(pd.DataFrame({'ds': list(prediction_dates)}))
+    return np.array(out[columns])
+
+
+def prophet_forecasts(series, dates, prediction_dates, columns, target: ForecastStore = store) -> np.ndarray:
+    """
+    Prophet outputs for many histories, from the store where possible and fitted otherwise.
+    Histories that are equal share one fit.
+
+    Args:
+        series: (n, len(dates)) stock histories.
+        dates: The months of the histories.
+        prediction_dates: Months to predict.
+        columns: Prophet output columns to return.
+        target: Store to read from and to add new fits to.
+
+    Returns:
+        np.ndarray: Shape (n, len(prediction_dates), len(columns)).
+    """
+    series = np.asarray(series, dtype=np.float32)
+    out = np.empty((len(series), len(prediction_dates), len(columns)), dtype=np.float32)
+    fits = {}
+    for i, y in enumerate(series):
+        key = forecast_key(dates, y, list(prediction_dates), columns)
+        if key not in fits:
+            cached = target.get(key)
+            if cached is None:
+                cached = fit_prophet(dates, y, prediction_dates, columns)
+                target.put(key, cached)
+            fits[key] = np.asarray(cached, dtype=np.float32)
+        out[i] = fits[key]
+    return out
+
+
+def window_config(anchor=None, horizon: int = FORECAST_HORIZON) -> dict:
+    """
+    The Prophet settings the app forecasts with: the window ending at anchor and the
+    horizon months after it.
+    """
+    months = window_months(anchor)
+    return {
+        'dates': months,
+        'prediction_dates': prediction_dates(months[-1], horizon),
+        'columns': prophet_config()['columns']
+    }
+
+
+def history_keys(data: pd.DataFrame, config: dict) -> dict:
+    """
+    Maps the forecast_key() of every product's Stocks Required history to that history.
+    """
+    # Gaps are filled like FeatureStore.window() does, so the keys match the app's lookups
+    history = data[[f"Stocks Required-{date}" for date in config['dates']]]
+    series = history.ffill(axis=1).bfill(axis=1).to_numpy(dtype=np.float32)
+    return {
+        forecast_key(config['dates'], y, config['prediction_dates'], config['columns']): y
+        for y in series
+    }
+
+
+def prune(target: ForecastStore = store) -> int:
+    """
+    Drops the forecasts that no product's current history refers to any more, e.g. after
+    an ingestion changed some products, and returns how many were dropped.
+    """
+    return target.retain(history_keys(feature_store.frame(), window_config()))
+
+
+def _fit_chunk(chunk: list, config: dict) -> dict:
+    return {
+        key: fit_prophet(config['dates'], y, config['prediction_dates'], config['columns']).tolist()
+        for key, y in chunk
+    }
+
+
+def _print_progress(done: int, total: int, elapsed: float):
+    print(f"Prophet refresh: {done}/{total} products ({done / elapsed:.1f}/s)", flush=True)
+
+
+def refresh(
+    data: Optional[pd.DataFrame] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+    target: ForecastStore = store,
+    progress: Callable[[int, int, float], None] = _print_progress,
+    anchor: Optional[str] = None,
+    horizon: int = FORECAST_HORIZON
+) -> dict:
+    """
+    Fits Prophet for every product across a process pool and atomically replaces the forecast store.
+
+    Args:
+        data: Products to refresh, defaults to the whole dataset.
+        workers: Number of worker processes, defaults to the number of cores.
+        chunk_size: Products per submitted task.
+        target: Store to write the results into.
+        progress: Called as progress(done, total, elapsed_seconds) after every chunk.
+        anchor: Last month of the window, defaults to the latest complete month.
+        horizon: Months to forecast after the anchor.
+
+    Returns:
+        dict: {"products": ..., "fits": ..., "seconds": ...}
+    """
+    if data is None:
+        data = feature_store.frame()
+    config = window_config(anchor, horizon)
+
+    # Products sharing a history share a fit
+    items = list(history_keys(data, config).items())
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    entries = {}
+    start = time.perf_counter()
+    # spawn, not fork: the caller may already have TensorFlow loaded
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=quiet_stan
+    ) as pool:
+        futures = [pool.submit(_fit_chunk, chunk, config) for chunk in chunks]
+        for future in as_completed(futures):
+            entries.update(future.result())
+            progress(len(entries), len(items), time.perf_counter() - start)
+
+    target.write(entries)
+    return {"products": len(data), "fits": len(entries), "seconds": round(time.perf_counter() - start, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--anchor", default=None, help="Last month of the window, e.g. 2024-12")
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON)
+    args = parser.parse_args()
+
+    print(refresh(workers=args.workers, chunk_size=args.chunk_size, anchor=args.anchor, horizon=args.horizon))
@@ -0,0 +1,127 @@
+"""
+Derives the stock model's input window from the data instead of hard-coded months.
+
+The model was trained on 13 consecutive months per product. Any anchor month with 12
+months of history before it can be forecast; the months after the anchor are the
+prediction dates. This module must not import TensorFlow (see prophet_refresh).
+"""
+from app.models.feature_store import feature_store
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Union
+import numpy as np
+import h5py
+import json
+import os
+
+MODEL_PATH = 'app/models/ulip_model_stock_forecasting.h5'
+
+# Months to forecast after the anchor, and the anchor itself ('YYYY-MM'); by default the
+# latest month every product has stock data for
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", 1))
+FORECAST_ANCHOR = os.getenv("FORECAST_ANCHOR")
+
+# Per-month features of the LSTM/CNN input, after the name, category and stock columns
+MODEL_FEATURES = [
+    'Stock Level Thresholds',
+    'Seasonality',
+    'Market Changes',
+    'Product Type',
+    'Lead time (in days)',
+    'Supplier Reliabilty',
+    'Stock Handing Efficiency',
+    'Product Costs(In Rs.)',
+    'Maximum discount offered (in percentage)',
+    'Products Expiry (in months)',
+    'Backorders',
+    'Bulk orders (By customers)'
+]
+
+
+@lru_cache
+def prophet_config(model_path: str = MODEL_PATH) -> dict:
+    """
+    Reads the Prophet layer's dates, prediction_date and output columns from the saved model.
+    """
+    with h5py.File(model_path, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+    layer = next(layer for layer in config['config']['layers'] if layer['class_name'] == 'ProphetModel')
+    return {
+        'dates': layer['config']['dates'],
+        'prediction_date': layer['config']['prediction_date'],
+        'columns': layer['config']['output_columns_selection']
+    }
+
+
+def window_length() -> int:
+    return len(prophet_config()['dates'])
+
+
+def month_start(value: Union[str, date]) -> str:
+    """
+    Normalises '2025-01', '2025-01-15' or a date to the first of its month, '2025-01-01'.
+    """
+    if isinstance(value, str):
+        value = datetime.strptime(value[:7], "%Y-%m").date()
+    return value.replace(day=1).isoformat()
+
+
+def add_months(month: str, months: int) -> str:
+    year, month_index = divmod(int(month[:4]) * 12 + int(month[5:7]) - 1 + months, 12)
+    return date(year, month_index + 1, 1).isoformat()
+
+
+def default_anchor() -> str:
+    if FORECAST_ANCHOR:
+        return month_start(FORECAST_ANCHOR)
+    return feature_store.latest_month('Stocks Required')
+
+
+def window_months(anchor: Optional[Union[str, date]] = None, length: Optional[int] = None) -> list[str]:
+    """
+    The consecutive months of history ending at anchor.
+
+    Args:
+        anchor: Last month of the window, defaults to default_anchor().
+        length: Number of months, defaults to the model's window.
+
+    Returns:
+        list: ISO month starts, e.g. ['2023-12-01', ..., '2024-12-01'].
+    """
+    anchor = month_start(anchor) if anchor else default_anchor()
+    length = length or window_length()
+    return [add_months(anchor, offset) for offset in range(1 - length, 1)]
+
+
+def prediction_dates(anchor: Optional[Union[str, date]] = None, horizon: int = FORECAST_HORIZON) -> list[str]:
+    """
+    The horizon months following anchor, e.g. ['2025-01-01', '2025-02-01', '2025-03-01'].
+    """
+    anchor = month_start(anchor) if anchor else default_anchor()
+    return [add_months(anchor, offset) for offset in range(1, horizon + 1)]
+
+
+def build_inputs(products: list[str], months: list[str]):
+    """
+    Builds both model inputs for every row whose name is in products.
+
+    Args:
+        products: Product names.
+        months: The window, as returned by window_months().
+
+    Returns:
+        tuple: (rows, history, hybrid) where rows describes the selected products,
+               history is the (n, months) stock history fed to Prophet and hybrid is
+               the (n, months, 15) LSTM/CNN input.
+
+    Raises:
+        ValueError: If a month of the window is not in the data.
+    """
+    rows, codes = feature_store.window(products, months, ['Stocks Required'] + MODEL_FEATURES)
+
+    # Every month repeats the product's name and category codes ahead of its features
+    static = rows[['name_code', 'category_code']].to_numpy(dtype=np.float32)
+    static = np.broadcast_to(static[:, None, :], (len(rows), len(months), static.shape[1]))
+    hybrid = np.concatenate([static, codes], axis=2)
+
+    return rows, codes[:, :, 0], hybrid
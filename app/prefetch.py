@@ -0,0 +1,205 @@
+"""
+Speculative warm-up of the route legs the planner is likely to ask for.
+
+The tools only start once the planner LLM has answered, yet most of its tool calls can
+be guessed from the source and destination: trains and flights between the stations
+and airports nearest to either end, and the ports nearest to them. While the planner
+runs, those scrapes and geocodes are started in the background. They go through the
+scrape cache and the seaways geocode cache, so a tool asking for a prefetched leg
+finds it cached, or joins the scrape still in flight.
+
+Every prefetched leg counts in prefetch_legs_total{mode}, and every one a tool then
+used in prefetch_hits_total{mode}; tool calls for legs that were not prefetched count
+in prefetch_misses_total{mode}.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Optional
+from app.deadline import Deadline, DeadlineExceeded
+from app.tools.road_graph import road_graph
+from app.supervisor import supervisor
+from app.tracing import span
+from app import geo, metrics, deadline
+import numpy as np
+import time
+import os
+
+# Set to false to start the tools only once the planner has answered
+ROUTE_PREFETCH = os.getenv("ROUTE_PREFETCH", "true").lower() in ("1", "true", "yes")
+
+# Train and flight scrapes started per request; each one is a browser session
+ROUTE_PREFETCH_SCRAPES = int(os.getenv("ROUTE_PREFETCH_SCRAPES", 4))
+
+# Stations and airports within this many km of an end are candidates, the nearest first
+PREFETCH_RADIUS_KM = 200
+PREFETCH_HUBS_PER_END = 2
+
+# Ports geocoded per end, the nearest first
+PREFETCH_PORTS_PER_END = 2
+
+# Seconds prefetches may run for a request without a deadline of its own
+PREFETCH_TIMEOUT = 300
+
+# How the planner names the ports of geo.PORTS when calling the seaways tool
+PORT_NAMES = {
+    "INBOM": "Mumbai Port, India",
+    "INNSA": "Nhava Sheva Port, India",
+    "INMUN": "Mundra Port, India",
+    "INCCU": "Kolkata Port, India",
+    "INMAA": "Chennai Port, India",
+}
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="prefetch")
+
+
+def _locate(place: str) -> Optional[tuple]:
+    # Offline only: the request must not wait for a geocoding service
+    graph = road_graph()
+    node = graph.geocode(place) if graph else None
+    return None if node is None else (float(graph.lat[node]), float(graph.lng[node]))
+
+
+def _nearest(hubs: dict, point: tuple, count: int, radius_km: Optional[float] = None) -> list[tuple]:
+    """
+    Up to count (code, distance in km) of the hubs (code -> (lat, lng)) nearest to point.
+    """
+    codes = list(hubs)
+    coords = np.array([hubs[code] for code in codes])
+    distances = geo.haversine_km(coords[:, 0], coords[:, 1], *point)
+    return [
+        (codes[i], float(distances[i])) for i in np.argsort(distances)[:count]
+        if radius_km is None or distances[i] <= radius_km
+    ]
+
+
+class Prefetch:
+    """
+    The legs prefetched for one route request, and which of them its tools used.
+
+    Prefetches run under their own budget, which ends with the request's tool budget and
+    is cancelled once the request is done, stopping the browsers of legs nobody used.
+    """
+    def __init__(self, budget: Deadline):
+        self.budget = budget
+        self.lock = Lock()
+        self.started = {}
+        self.used = set()
+
+    def _run(self, name: str, func: Callable, *args):
+        with deadline.use_deadline(self.budget), span(f"prefetch.{name}"):
+            try:
+                self.budget.check()
+                func(*args)
+            except DeadlineExceeded:
+                pass
+            except Exception as e:
+                print(f"Prefetch of {name} {args} failed:", e)
+
+    def start(self, mode: str, key: tuple, warm: Callable):
+        """
+        Runs warm(*key) in the background, unless the leg was already started.
+        """
+        leg = (mode, *key)
+        with self.lock:
+            if leg in self.started:
+                return
+            self.started[leg] = time.monotonic()
+        metrics.inc("prefetch_legs_total", mode=mode)
+        _executor.submit(self._run, mode, warm, *key)
+
+    def plan(self, source: str, destination: str):
+        """
+        Starts the legs likely between source and destination. Places the offline road
+        graph does not know are geocoded first, in the background.
+        """
+        ends = (_locate(source), _locate(destination))
+        if None in ends:
+            _executor.submit(self._run, "plan", self._plan_online, source, destination, ends)
+        else:
+            self._start_legs(*ends)
+
+    def _plan_online(self, source: str, destination: str, ends: tuple):
+        from app.tools.seaways import geocode
+        src, dst = (end or geocode(place) for end, place in zip(ends, (source, destination)))
+        if src and dst:
+            self._start_legs(src, dst)
+
+    def _start_legs(self, src: tuple, dst: tuple):
+        from app.tools import airways, railways, seaways
+
+        scrapes = []
+        for mode, hubs, fetch in (
+            ("railways", geo.HUBS["rail"], railways.fetch_trains),
+            ("airways", geo.HUBS["air"], airways.fetch_flights)
+        ):
+            for a, a_km in _nearest(hubs, src, PREFETCH_HUBS_PER_END, PREFETCH_RADIUS_KM):
+                for b, b_km in _nearest(hubs, dst, PREFETCH_HUBS_PER_END, PREFETCH_RADIUS_KM):
+                    if a != b:
+                        scrapes.append((a_km + b_km, mode, (a, b), fetch))
+
+        # The legs closest to the two ends are the likeliest, whatever their mode
+        scrapes.sort(key=lambda scrape: scrape[0])
+        # No speculative browsers while memory is short
+        if not supervisor.scraping_paused:
+            for _, mode, key, fetch in scrapes[:ROUTE_PREFETCH_SCRAPES]:
+                self.start(mode, key, fetch)
+
+        ports = _nearest(geo.HUBS["sea"], src, PREFETCH_PORTS_PER_END) + _nearest(geo.HUBS["sea"], dst, PREFETCH_PORTS_PER_END)
+        for code, _ in ports:
+            self.start("seaways", (PORT_NAMES[code],), seaways.geocode)
+
+    def consume(self, mode: str, key: tuple):
+        leg = (mode, *key)
+        with self.lock:
+            started = self.started.get(leg)
+            first = leg not in self.used
+            self.used.add(leg)
+
+        if started is None:
+            metrics.inc("prefetch_misses_total", mode=mode)
+        elif first:
+            metrics.inc("prefetch_hits_total", mode=mode)
+            # How long before the tool asked for it the leg was started
+            metrics.observe("prefetch_lead_seconds", time.monotonic() - started, mode=mode)
+
+
+# The prefetch of the route request being handled
+_current: ContextVar[Optional[Prefetch]] = ContextVar("prefetch", default=None)
+
+
+@contextmanager
+def route_legs(source: str, destination: str, reserve: float = 0.0):
+    """
+    Prefetches the likely legs between source and destination while the block runs.
+
+    Args:
+        source: The route's starting location, as given by the user.
+        destination: The route's target location.
+        reserve: Seconds of the request's deadline kept back from the prefetches, as from the tools.
+    """
+    if not ROUTE_PREFETCH:
+        yield None
+        return
+
+    parent = deadline.current()
+    with parent.child(reserve) if parent else nullcontext(Deadline(PREFETCH_TIMEOUT)) as budget:
+        prefetch = Prefetch(budget)
+        token = _current.set(prefetch)
+        try:
+            prefetch.plan(source, destination)
+            yield prefetch
+        finally:
+            _current.reset(token)
+            budget.cancel()
+
+
+def consume(mode: str, *key):
+    """
+    Records that a tool asked for a leg, e.g. consume("railways", "PUNE", "NDLS"), as a
+    hit if it was prefetched for the current request.
+    """
+    prefetch = _current.get()
+    if prefetch is not None:
+        prefetch.consume(mode, key)
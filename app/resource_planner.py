@@ -0,0 +1,216 @@
+from datetime import date, datetime, time, timedelta
+from app.models.feature_store import feature_store
+import pandas as pd
+import numpy as np
+import os
+
+# Productivity rates, overridable from the environment
+WORKING_DAYS_PER_MONTH = int(os.getenv("WORKING_DAYS_PER_MONTH", 26))
+FORKLIFT_UNITS_PER_DAY = float(os.getenv("FORKLIFT_UNITS_PER_DAY", 400))
+MANUAL_UNITS_PER_LABOUR = float(os.getenv("MANUAL_UNITS_PER_LABOUR", 60))
+MANUAL_BULK_UNITS_PER_LABOUR = float(os.getenv("MANUAL_BULK_UNITS_PER_LABOUR", 25))
+TRUCK_UNITS_PER_DAY = float(os.getenv("TRUCK_UNITS_PER_DAY", 600))
+LOADERS_PER_TRUCK = int(os.getenv("LOADERS_PER_TRUCK", 2))
+MAX_FORKLIFTS = int(os.getenv("MAX_FORKLIFTS", 10))
+MAX_TRUCKS = int(os.getenv("MAX_TRUCKS", 10))
+
+# Scheduling: hours in a standard shift, weekday load (Mon..Sun) and busy hours per direction
+SHIFT_HOURS = float(os.getenv("SHIFT_HOURS", 8))
+DAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0]
+INBOUND_HOURS = (6, 14)
+OUTBOUND_HOURS = (12, 22)
+
+# Share of a product's volume that moves palletised (i.e. needs a forklift)
+BULK_SHARE = {
+    'very often': 0.8,
+    'often': 0.5,
+    'rare': 0.2
+}
+
+# Extra handling effort per unit, relative to an excellently handled product
+HANDLING_EFFORT = {
+    'excellent': 1.0,
+    'average': 1.25,
+    'poor': 1.5
+}
+
+
+def _latest(data: pd.DataFrame, feature: str) -> pd.Series:
+    # Months can be ingested for some products only, so take each product's latest known value
+    columns = [col for col in data.columns if col.startswith(f"{feature}-")]
+    return data[columns].ffill(axis=1).iloc[:, -1]
+
+
+def handling_attributes(products: list[str]) -> pd.DataFrame:
+    """
+    Looks up the bulk share and handling effort of each product from its latest month in the dataset.
+
+    Args:
+        products: Product names to look up.
+
+    Returns:
+        pd.DataFrame: Indexed by product name with 'bulk_share' and 'effort' columns.
+                      Unknown products fall back to an average profile.
+    """
+    dataset = feature_store.frame()
+    data = dataset.set_index(dataset.columns[0])
+    data = data[~data.index.duplicated()].reindex(products)
+
+    bulk = _latest(data, 'Bulk orders (By customers)').map(BULK_SHARE).fillna(BULK_SHARE['often'])
+    effort = _latest(data, 'Stock Handing Efficiency').map(HANDLING_EFFORT).fillna(HANDLING_EFFORT['average'])
+
+    return pd.DataFrame({'bulk_share': bulk, 'effort': effort})
+
+
+def allocate(raw_units, workload, bulk_units, capacity: float = 1.0) -> dict:
+    """
+    Sizes forklifts, trucks and labour for one or more time slots at once.
+
+    Args:
+        raw_units: Units moved in each slot.
+        workload: Effort-weighted units handled in each slot.
+        bulk_units: Effort-weighted palletised units in each slot.
+        capacity: Fraction of a full working day each slot represents.
+
+    Returns:
+        dict: Integer arrays under 'forklifts', 'trucks' and 'labour', one entry per slot.
+    """
+    raw_units = np.atleast_1d(np.asarray(raw_units, dtype=float))
+    workload = np.atleast_1d(np.asarray(workload, dtype=float))
+    bulk_units = np.atleast_1d(np.asarray(bulk_units, dtype=float))
+    manual_units = workload - bulk_units
+
+    forklift_rate = FORKLIFT_UNITS_PER_DAY * capacity
+    forklifts = np.minimum(np.ceil(bulk_units / forklift_rate), MAX_FORKLIFTS)
+    overflow = np.maximum(bulk_units - forklifts * forklift_rate, 0)
+
+    trucks = np.minimum(np.ceil(raw_units / (TRUCK_UNITS_PER_DAY * capacity)), MAX_TRUCKS)
+
+    labour = (
+        np.ceil((manual_units / MANUAL_UNITS_PER_LABOUR + overflow / MANUAL_BULK_UNITS_PER_LABOUR) / capacity)
+        + forklifts
+        + trucks * LOADERS_PER_TRUCK
+    )
+
+    return {
+        "forklifts": forklifts.astype(int),
+        "trucks": trucks.astype(int),
+        "labour": labour.astype(int)
+    }
+
+
+def plan_resources(forecast: dict) -> dict:
+    """
+    Computes the daily forklift, truck and labour requirement for a monthly stock forecast.
+
+    Each product's monthly requirement is spread over the working days and weighted by its
+    handling effort. Palletised volume is given to forklifts up to MAX_FORKLIFTS; whatever
+    does not fit is handled manually at the slower bulk rate. Trucks are sized on raw volume,
+    and labour covers manual handling, one operator per forklift and loaders per truck.
+
+    Args:
+        forecast: Mapping of product name to its predicted monthly stock requirement.
+                  Example: {"Maggi": 309, "Parle-G": 390}
+
+    Returns:
+        dict: Example: {"forklifts": 3, "trucks": 2, "labour": 41}
+    """
+    if not forecast:
+        return {"forklifts": 0, "trucks": 0, "labour": 0}
+
+    attrs = handling_attributes(list(forecast))
+    daily = np.maximum(np.fromiter(forecast.values(), dtype=float), 0) / WORKING_DAYS_PER_MONTH
+
+    workload = daily * attrs['effort'].to_numpy()
+    bulk_units = workload * attrs['bulk_share'].to_numpy()
+
+    plan = allocate(daily.sum(), workload.sum(), bulk_units.sum())
+    return {resource: int(count[0]) for resource, count in plan.items()}
+
+
+def _shift_profile(shifts_per_day: int, peak_hours: tuple[int, int]) -> np.ndarray:
+    hours = np.arange(24)
+    weights = np.where((hours >= peak_hours[0]) & (hours < peak_hours[1]), 1.0, 0.1)
+    per_shift = weights.reshape(shifts_per_day, -1).sum(axis=1)
+    return per_shift / per_shift.sum()
+
+
+def schedule_resources(
+    forecast: dict,
+    start: date,
+    days: int = 7,
+    shifts_per_day: int = 3
+) -> dict:
+    """
+    Builds a shift-by-shift forklift, truck and labour schedule over a multi-day horizon.
+
+    Each product's daily volume is split into inbound (replenishment, received mostly in the
+    morning) and outbound (dispatch, mostly in the afternoon) movements. Volumes for every
+    product and slot are computed as one (products x slots) array, then each slot is sized
+    with the same allocation as the daily plan, scaled to the slot length.
+
+    Args:
+        forecast: Mapping of product name to its predicted monthly stock requirement.
+        start: First day of the schedule.
+        days: Number of days to schedule.
+        shifts_per_day: Number of slots per day; must divide 24 (24 gives an hourly schedule).
+
+    Returns:
+        dict: A dictionary with one entry per slot under 'slots':
+              Example: {"slots": [{"start": "2025-01-06T00:00:00", "end": "2025-01-06T08:00:00",
+                        "inbound": 12, "outbound": 3, "forklifts": 1, "trucks": 1, "labour": 5}, ...],
+                        "peak": {"forklifts": 4, "trucks": 2, "labour": 30}}
+    """
+    if 24 % shifts_per_day:
+        raise ValueError("shifts_per_day must divide 24")
+
+    products = list(forecast)
+    attrs = handling_attributes(products)
+    daily = np.maximum(np.fromiter(forecast.values(), dtype=float, count=len(products)), 0) / WORKING_DAYS_PER_MONTH
+
+    day_weights = np.array([
+        DAY_WEIGHTS[(start + timedelta(days=d)).weekday()] for d in range(days)
+    ])
+    inbound_profile = np.outer(day_weights, _shift_profile(shifts_per_day, INBOUND_HOURS)).ravel()
+    outbound_profile = np.outer(day_weights, _shift_profile(shifts_per_day, OUTBOUND_HOURS)).ravel()
+
+    # (products x slots) volumes; a day's movement is split evenly between inbound and outbound
+    inbound = 0.5 * daily[:, None] * inbound_profile[None, :]
+    outbound = 0.5 * daily[:, None] * outbound_profile[None, :]
+    moved = inbound + outbound
+
+    effort = attrs['effort'].to_numpy()[:, None]
+    bulk_share = attrs['bulk_share'].to_numpy()[:, None]
+    workload = moved * effort
+
+    plan = allocate(
+        moved.sum(axis=0),
+        workload.sum(axis=0),
+        (workload * bulk_share).sum(axis=0),
+        capacity=(24 / shifts_per_day) / SHIFT_HOURS
+    )
+
+    slot_length = timedelta(hours=24 / shifts_per_day)
+    slot_starts = [
+        datetime.combine(start, time.min) + i * slot_length for i in range(days * shifts_per_day)
+    ]
+    inbound_totals = np.rint(inbound.sum(axis=0)).astype(int)
+    outbound_totals = np.rint(outbound.sum(axis=0)).astype(int)
+
+    slots = [
+        {
+            "start": slot_start.isoformat(),
+            "end": (slot_start + slot_length).isoformat(),
+            "inbound": int(inbound_totals[i]),
+            "outbound": int(outbound_totals[i]),
+            "forklifts": int(plan["forklifts"][i]),
+            "trucks": int(plan["trucks"][i]),
+            "labour": int(plan["labour"][i])
+        }
+        for i, slot_start in enumerate(slot_starts)
+    ]
+
+    return {
+        "slots": slots,
+        "peak": {resource: int(counts.max(initial=0)) for resource, counts in plan.items()}
+    }
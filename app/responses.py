@@ -0,0 +1,13 @@
+from fastapi.responses import JSONResponse
+from typing import Any
+import orjson
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSON response serialized with orjson, which also takes NumPy values and non-string keys.
+
+    FastAPI's own ORJSONResponse does the same but is deprecated, and warns on every response.
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
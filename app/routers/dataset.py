@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException
+from app.schemas import MonthIngest, ProductsIngest
+from app.models.feature_store import feature_store
+from app.models.prophet_refresh import prune
+from app.forecast_table import scheduler
+from app.tracing import span
+from starlette.concurrency import run_in_threadpool
+from datetime import date
+
+router = APIRouter()
+
+
+def _month(value: date) -> str:
+    return value.replace(day=1).isoformat()
+
+
+def ingest(records: list[dict]) -> dict:
+    """
+    Writes observations to the feature store and drops the cached Prophet forecasts of
+    the products whose history changed.
+
+    Args:
+        records: Observations as accepted by FeatureStore.upsert().
+
+    Returns:
+        dict: The upsert summary plus 'invalidated_forecasts', the number of dropped forecasts.
+              Example: {"products": [0, 979], "months": ["2025-01-01"], "observations": 16,
+                        "invalidated_forecasts": 1}
+    """
+    with span("dataset.upsert"):
+        result = feature_store.upsert(records)
+    with span("dataset.invalidate"):
+        result["invalidated_forecasts"] = prune()
+    # Rematerialize the forecast table now rather than at the next poll
+    scheduler.trigger()
+    return result
+
+
+@router.post("/dataset/months")
+async def ingest_month(input_data: MonthIngest):
+    """
+    Appends (or overwrites) one month of observations for the given products.
+    """
+    records = [
+        {**product.model_dump(exclude={"features"}), "month": _month(input_data.month), "features": product.features}
+        for product in input_data.products
+    ]
+    try:
+        return await run_in_threadpool(ingest, records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/dataset/products")
+async def upsert_products(input_data: ProductsIngest):
+    """
+    Inserts new products or replaces months of existing ones.
+    """
+    records = [
+        {**product.model_dump(exclude={"months"}), "month": _month(month), "features": features}
+        for product in input_data.products
+        for month, features in product.months.items()
+    ]
+    try:
+        return await run_in_threadpool(ingest, records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
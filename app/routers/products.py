@@ -1,29 +1,67 @@
-from fastapi import APIRouter, HTTPException
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.responses import OrjsonResponse
+from app.catalog import catalog
+from typing import Optional
 
 router = APIRouter()
 
-dataset = pd.read_csv('app/models/dataset.csv')
+def get_products(
+    query: str = "",
+    category: Optional[str] = None,
+    fuzzy: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None
+) -> dict:
+    """
+    Fetches a page of the product catalog, optionally filtered by name and category.
+
+    Args:
+        query: Name prefix, or any word's prefix ('cheese' matches 'Amul Cheese'). Empty matches everything.
+        category: Only return products of this category.
+        fuzzy: Also return close matches for misspelt names.
+        offset: Number of matches to skip.
+        limit: Maximum number of names to return, all when None.
+
+    Returns:
+        dict: A dictionary containing the matching product names under the key 'products',
+              the number of matches and the matches per category.
+              Example: {"products": ["product1", "product2"], "total": 2, "offset": 0, "limit": None,
+                        "categories": {"Electronics": 2}}
+    """
+    return catalog().page(query, category, fuzzy, offset, limit)
 
-def get_products() -> dict:
+def search_products(query: str = "", category: Optional[str] = None, limit: int = 20) -> dict:
     """
-    Fetches the list of products from the first column of the dataset.
+    Searches the product catalog by name and returns at most `limit` matching product names.
+
+    Args:
+        query: Part of the product name, e.g. "maggi" or "cheese". Leave empty to browse a category.
+        category: Optional product category to restrict the search to.
+        limit: Maximum number of names to return.
 
     Returns:
-        dict: A dictionary containing a list of product names under the key 'products'.
-              Example: {"products": ["product1", "product2", "product3", ...]}
-    
-    This function does not take any input parameters. It reads the dataset from a CSV file
-    and extracts non-null values from the first column, which is assumed to contain product names.
+        dict: {"products": [...matching names...], "total": number of matches,
+               "categories": {category: number of matches}}
+              Use the categories to narrow down a search with many matches.
     """
-    first_column = dataset.columns[0]
-    products = dataset[first_column].dropna().tolist() 
-    return {"products": products}
+    page = catalog().page(query, category, fuzzy=True, limit=limit)
+    return {"products": page["products"], "total": page["total"], "categories": page["categories"]}
 
 
 @router.get("/get_products")
-def get_products_route():
+def get_products_route(
+    request: Request,
+    q: str = "",
+    category: Optional[str] = None,
+    fuzzy: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+):
     try:
-        return get_products()
+        # The catalog only changes with the dataset, so its hash is a valid tag for every query
+        etag = f'"{catalog().etag}"'
+        if request.headers.get("if-none-match") in (etag, f"W/{etag}"):
+            return Response(status_code=304, headers={"ETag": etag})
+        return OrjsonResponse(get_products(q, category, fuzzy, offset, limit), headers={"ETag": etag})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
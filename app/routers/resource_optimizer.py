@@ -1,57 +1,124 @@
-from fastapi import APIRouter, HTTPException
-from langchain_google_genai import ChatGoogleGenerativeAI
+from fastapi import APIRouter, HTTPException, Query
+from app.routers.stock_forecast import forecast_stock
+from app.models.feature_store import feature_store
+from app.inference import InferenceQueueFull
+from app.resource_planner import plan_resources, schedule_resources
+from app.structured_output import structured, ainvoke_structured
+from app.schemas import ResourceEstimate
+from app.llm import chat_model
+from datetime import date
+from typing import Optional
 import os
-import json
-import re
 
 router = APIRouter()
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
+RESOURCE_OPTIMIZER_MODE = os.getenv("RESOURCE_OPTIMIZER_MODE", "planner")
 
-async def resource_optimizer() -> dict:
+resource_llm = structured(chat_model("google"), ResourceEstimate)
+
+async def llm_resource_estimate() -> dict:
     """
     Uses Gemini LLM to simulate warehouse resource optimization.
 
-    This function invokes the Gemini language model to randomly estimate:
-    - Number of forklifts (between 1 to 10)
-    - Number of trucks (between 1 to 10)
-    - Number of labourers (between 20 to 100)
-
     Returns:
-        dict: A dictionary with randomly generated resource allocations:
-              Example: {"forklifts": 7, "trucks": 3, "labour": 56}
+        dict: Example: {"forklifts": 7, "trucks": 3, "labour": 56}
 
     Raises:
-        Exception: If the LLM fails to respond or response is invalid.
+        StructuredOutputError: If the response still does not match the schema after repair.
     """
     prompt = (
-        "Generate a JSON object with random realistic values for warehouse resources. "
-        "The object should contain:\n"
+        "Generate random realistic values for warehouse resources:\n"
         "- 'forklifts': an integer between 1 and 10\n"
         "- 'trucks': an integer between 1 and 10\n"
-        "- 'labour': an integer between 20 and 100\n\n"
-        "Respond only with the JSON object."
+        "- 'labour': an integer between 20 and 100"
     )
 
-    response = await llm.ainvoke(prompt)
-    content = response.content.strip()
+    estimate = await ainvoke_structured(resource_llm, prompt, "resource_optimizer")
+    return estimate.model_dump()
 
-    # Remove markdown code block syntax if present
-    if content.startswith("```"):
-        content = re.sub(r"```(?:json)?", "", content)
-        content = content.replace("```", "").strip()
+async def resource_optimizer(products: Optional[list[str]] = None, mode: str = RESOURCE_OPTIMIZER_MODE) -> dict:
+    """
+    Estimates the warehouse resources required for a day.
 
-    try:
-        return json.loads(content)
-    except Exception:
-        raise Exception(f"Invalid response from LLM after cleanup: {content}")
+    By default the estimate is computed from the stock forecast: each product's predicted
+    requirement is turned into a daily workload using its bulk-order frequency and stock
+    handling efficiency, and forklifts, trucks and labour are sized to cover that workload.
+
+    Args:
+        products: Optional list of product names to plan for. Plans for every product when omitted.
+        mode: "planner" for the forecast-driven estimate, "llm" to ask Gemini instead.
+
+    Returns:
+        dict: A dictionary with the resource allocation:
+              Example: {"forklifts": 7, "trucks": 3, "labour": 56}
+
+    Raises:
+        ValueError: If the mode is unknown.
+        Exception: If the LLM fails to respond or response is invalid.
+    """
+    if mode == "llm":
+        return await llm_resource_estimate()
+    if mode != "planner":
+        raise ValueError(f"Unknown resource optimizer mode: {mode}")
+
+    return plan_resources(await forecast_products(products))
+
+async def forecast_products(products: Optional[list[str]] = None) -> dict:
+    if not products:
+        products = feature_store.product_names()
+
+    return await forecast_stock(products)
+
+async def resource_schedule(
+    products: Optional[list[str]] = None,
+    start: Optional[date] = None,
+    days: int = 7,
+    shifts_per_day: int = 3
+) -> dict:
+    """
+    Plans forklifts, trucks and labour shift by shift over the coming days.
+
+    Args:
+        products: Optional list of product names to plan for. Plans for every product when omitted.
+        start: First day of the schedule, defaults to today.
+        days: Number of days to schedule (default 7).
+        shifts_per_day: Slots per day, e.g. 3 for 8-hour shifts or 24 for hourly slots.
+
+    Returns:
+        dict: Per-slot inbound/outbound volumes and resource counts under 'slots',
+              and the highest count of each resource under 'peak'.
+    """
+    forecast = await forecast_products(products)
+    return schedule_resources(forecast, start or date.today(), days, shifts_per_day)
 
 @router.get("/resource_optimizer")
-async def resource_optimizer_route():
+async def resource_optimizer_route(
+    products: Optional[list[str]] = Query(None),
+    mode: str = RESOURCE_OPTIMIZER_MODE
+):
+    if mode not in ("planner", "llm"):
+        raise HTTPException(status_code=400, detail=f"Unknown resource optimizer mode: {mode}")
+
+    try:
+        return await resource_optimizer(products, mode)
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/resource_schedule")
+async def resource_schedule_route(
+    products: Optional[list[str]] = Query(None),
+    start: Optional[date] = None,
+    days: int = Query(7, ge=1, le=31),
+    shifts_per_day: int = Query(3, ge=1, le=24)
+):
+    if 24 % shifts_per_day:
+        raise HTTPException(status_code=400, detail="shifts_per_day must divide 24")
+
     try:
-        return await resource_optimizer()
+        return await resource_schedule(products, start, days, shifts_per_day)
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,22 @@
 from langchain_core.messages import HumanMessage, SystemMessage
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
 from app.schemas import OptimizeRoute
-from app.agent import graph
+from app.agent import graph, SUMMARIZER_RESERVE
+from app.deadline import Deadline, DeadlineExceeded, use_deadline
+from app import metrics, prefetch
+import asyncio
 import json
+import os
 
 router = APIRouter()
 
+# Seconds a route request may take before the tools still running are abandoned
+ROUTE_OPTIMIZER_BUDGET = float(os.getenv("ROUTE_OPTIMIZER_BUDGET", 90))
+
+# How often (seconds) to check whether the client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
 def best_route(source: str, destination: str) -> dict:
     """
     Suggests the 3 best multi-modal shipping routes from a source to a destination.
@@ -29,15 +40,45 @@ def best_route(source: str, destination: str) -> dict:
         HumanMessage(content=f"Give me 3 best ways to ship cargos from {source} to {destination}, using airways, railways, seaways, or roadways. Consider cost, time, and carbon emission. Don't give direct routes, you may give routes like first go from pune to delhi by train, then delhi to california by flight, or first go from pune to mumbai by road, then mumbai to california by ship or something like that. For each route i want Total time, total cost (INR), total carbon emission.")
     ]
 
-    final_state = graph.invoke({"messages": messages})
+    # Scrapes and geocodes the legs the planner is likely to ask for while it thinks
+    with prefetch.route_legs(source, destination, SUMMARIZER_RESERVE):
+        final_state = graph.invoke({"messages": messages})
+
+    if "routes" in final_state:
+        return final_state["routes"]
+
+    # The planner answered without calling any tool, so there was nothing to summarize
+    return json.loads(final_state["messages"][-1].content)
 
-    final_message = final_state["messages"][-1]
-    
-    return json.loads(final_message.content)
+def best_route_within(budget: Deadline, source: str, destination: str) -> dict:
+    """
+    best_route() under a time budget: tools still running when it runs out are abandoned,
+    and the routes are summarized from the results that arrived in time.
+
+    Raises:
+        DeadlineExceeded: When the budget ran out, or was cancelled, before the planner finished.
+    """
+    with use_deadline(budget):
+        return best_route(source, destination)
 
 @router.post('/route_optimizer')
-def route_optimizer(req: OptimizeRoute):
+async def route_optimizer(req: OptimizeRoute, request: Request):
+    budget = Deadline(req.budget_seconds or ROUTE_OPTIMIZER_BUDGET)
+    task = asyncio.ensure_future(run_in_threadpool(best_route_within, budget, req.source, req.destination))
     try:
-        return best_route(req.source, req.destination)
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                # Stops the tools and their browsers; nobody will read the answer
+                budget.cancel()
+                metrics.inc("route_optimizer_cancelled_total")
+                return Response(status_code=499)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not task.done():
+            budget.cancel()
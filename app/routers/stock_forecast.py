@@ -1,40 +1,43 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas import ProductInput
-from app.models.model_loader import encoder, model
-import pandas as pd
+from fastapi import APIRouter, HTTPException, Response
+from app.schemas import ProductInput, WhatIfInput
+from app.models.model_loader import head
+from app.models.prophet_refresh import prophet_forecasts, window_config
+from app.models.windowing import build_inputs, FORECAST_HORIZON
+from app.tracing import span
+from app.what_if import what_if
+from app.inference import InferenceQueueFull
+from app.forecast_table import forecast_table
+from app import inference
+from datetime import datetime, timezone
+from typing import Optional
 import numpy as np
-import tensorflow as tf
 
 router = APIRouter()
 
-features = [
-    'Stock Level Thresholds',
-    'Seasonality',
-    'Market Changes',
-    'Product Type',
-    'Lead time (in days)',
-    'Supplier Reliabilty',
-    'Stock Handing Efficiency',
-    'Product Costs(In Rs.)',
-    'Maximum discount offered (in percentage)',
-    'Products Expiry (in months)',
-    'Backorders',
-    'Bulk orders (By customers)'
-]
-
-dates = [
-    '2023-12-01', '2024-01-01', '2024-02-01', '2024-03-01',
-    '2024-04-01', '2024-05-01', '2024-06-01', '2024-07-01',
-    '2024-08-01', '2024-09-01', '2024-10-01', '2024-11-01', '2024-12-01'
-]
-
-months = [
-    'Dec-2023', 'Jan-2024,', 'Feb-2024', 'Mar-2024',
-    'Apr-2024', 'May-2024', 'Jun-2024', 'Jul-2024',
-    'Aug-2024', 'Sep-2024', 'Oct-2024', 'Nov-2024', 'Dec-2024'
-]
-
-dataset = pd.read_csv('app/models/dataset.csv')
+def forecast_window(products: list[str], anchor: Optional[str] = None, horizon: int = FORECAST_HORIZON):
+    """
+    Runs the stock model for every month of the horizon after anchor.
+
+    Prophet is fitted once per product and predicts all horizon months in one call; the
+    network then runs once over every (product, month) pair as a single batch.
+
+    Returns:
+        tuple: (names, months, units) where units has shape (len(names), horizon).
+    """
+    config = window_config(anchor, horizon)
+
+    with span("stock_forecast.window"):
+        rows, history, hybrid = build_inputs(products, config['dates'])
+
+    with span("stock_forecast.prophet"):
+        prophet = prophet_forecasts(history, config['dates'], config['prediction_dates'], config['columns'])
+
+    with span("stock_forecast.predict"):
+        n, steps, columns = prophet.shape
+        predictions = head.predict([prophet.reshape(n * steps, columns), np.repeat(hybrid, steps, axis=0)], verbose=0)
+        units = np.rint(predictions).astype(int).reshape(n, steps)
+
+    return rows['name'].tolist(), config['prediction_dates'], units
 
 def stock_forecast(products: list[str]) -> dict:
     """
@@ -49,42 +52,94 @@ def stock_forecast(products: list[str]) -> dict:
 
     This function uses a hybrid deep learning model (LSTM + CNN + Prophet) to forecast
     monthly stock needs. It processes the numerical and categorical data for each product
-    and returns a rounded integer prediction of required stock levels.
+    and returns a rounded integer prediction of required stock levels for the month after
+    the latest complete month in the data.
     """
     print(products)
-    data = dataset[dataset[dataset.columns[0]].isin(products)]
-
-    # data = pd.DataFrame(products)
-    data_cat = data.select_dtypes(include=['object'])
-    data_num = data.select_dtypes(exclude=['object'])
-    data_cat_encoded = encoder.transform(data_cat)
-    data_cat_encoded = pd.DataFrame(data_cat_encoded, columns=data_cat.columns)
-    data_X = pd.concat([data_num, data_cat_encoded], axis=1).astype('float32')
-
-    data_by_month = []
-    for i in range(len(data_X)):
-        exp = []
-        for j in range(13):
-            cols = ['Product Name', 'Product Category']
-            cols.append(f"Stocks Required-{dates[j]}")
-            for feat in features:
-                cols.append(feat + f'-{months[j]}')
-            inst = list(data_X.loc[i, cols])
-            exp.append(inst)
-        data_by_month.append(exp)
-    lstm_cnn_hybrid_data = np.array(data_by_month)
-
-    prophet_model_data = data_X[[f'Stocks Required-{date}' for date in dates]].to_numpy()
-
-    predictions = model.predict([prophet_model_data, lstm_cnn_hybrid_data])
-    pred = tf.round(predictions)
-    pred = tf.cast(pred, tf.int32)
-
-    return {product: int(stock) for product, stock in zip(data['Product Name'], pred)}
+    names, _, units = forecast_window(products, horizon=1)
+    return {product: int(stock) for product, stock in zip(names, units[:, 0])}
+
+def stock_forecast_horizon(products: list[str], horizon: int, anchor: Optional[str] = None) -> dict:
+    """
+    Predicts the stock requirement of each product for several months.
+
+    Args:
+        products: A list of product names.
+        horizon: Number of months to forecast after anchor.
+        anchor: Last month of history to use ('YYYY-MM'), defaults to the latest complete month.
+
+    Returns:
+        dict: Product name to month to predicted stock.
+              Example: {"Widget A": {"2025-01-01": 120, "2025-02-01": 131}}
+    """
+    names, months, units = forecast_window(products, anchor, horizon)
+    return {
+        product: {month: int(stock) for month, stock in zip(months, row)}
+        for product, row in zip(names, units)
+    }
+
+async def forecast_stock(products: list[str]) -> dict:
+    """
+    Predicts the future stock requirement for a list of products.
+
+    Args:
+        products: A list of product names for which stock forecasts are needed.
+
+    Returns:
+        dict: A dictionary mapping each product name to its predicted stock requirement.
+              Example: {"Widget A": 120, "Gadget B": 85}
+
+    Forecasts come from the materialized forecast table when it covers the products,
+    otherwise the model runs on the dedicated inference executor, like /predict_stock.
+    """
+    materialized = forecast_table.lookup(products)
+    if materialized is not None:
+        return materialized
+    return await inference.executor.run(stock_forecast, products)
+
+# Response header telling when the forecasts were computed, kept out of the product -> units body
+COMPUTED_AT_HEADER = "X-Forecast-Computed-At"
 
 @router.post("/predict_stock")
-def predict_stock(input_data: ProductInput):
+async def predict_stock(input_data: ProductInput, response: Response):
+    try:
+        if not input_data.fresh and input_data.anchor is None:
+            materialized = forecast_table.lookup(input_data.products, input_data.horizon)
+            if materialized is not None:
+                response.headers[COMPUTED_AT_HEADER] = forecast_table.computed_at
+                return materialized
+
+        response.headers[COMPUTED_AT_HEADER] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if input_data.horizon is None and input_data.anchor is None:
+            forecasts = await inference.executor.run(stock_forecast, input_data.products)
+        else:
+            forecasts = await inference.executor.run(
+                stock_forecast_horizon,
+                input_data.products,
+                input_data.horizon or 1,
+                input_data.anchor and input_data.anchor.isoformat()
+            )
+        return forecasts
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/what_if")
+async def what_if_route(input_data: WhatIfInput):
     try:
-        return stock_forecast(input_data.products)
+        return await inference.executor.run(
+            what_if,
+            input_data.products,
+            [scenario.model_dump() for scenario in input_data.scenarios],
+            input_data.sensitivity,
+            input_data.anchor and input_data.anchor.isoformat()
+        )
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,79 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Dict, Any, Optional, Union
+from datetime import date
 
 # class ProductInput(BaseModel):
 #     products: List[Dict[str, Any]]
 
 class ProductInput(BaseModel):
     products: List[str]
+    horizon: Optional[int] = Field(None, ge=1, le=12, description="Months to forecast; returns product -> month -> stock when set")
+    anchor: Optional[date] = Field(None, description="Last month of history to forecast from, defaults to the latest complete month")
+    fresh: bool = Field(False, description="Run the model now instead of answering from the materialized forecast table")
 
 class OptimizeRoute(BaseModel):
     source: str
     destination: str
+    budget_seconds: Optional[float] = Field(None, gt=0, le=300, description="Time budget of the request, defaults to ROUTE_OPTIMIZER_BUDGET")
 
 class BotSchema(BaseModel):
     chat_id: str
-    prompt: str
\ No newline at end of file
+    prompt: str
+
+class RouteLeg(BaseModel):
+    from_: str = Field(alias="from", description="Origin city of the leg")
+    to: str = Field(description="Destination city of the leg")
+    distance: str = Field(description="Distance with units")
+    by: str = Field(description="Transport mode: train/truck/flight/ship")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class RouteOption(BaseModel):
+    total_cost: float = Field(description="Total cost in INR")
+    total_time: str = Field(description="Total time with units")
+    total_carbon_emission: str = Field(description="Total emission with units")
+    feature: str = Field("", description="Explanation of why this route is chosen")
+    route: List[RouteLeg]
+
+class RouteOptions(BaseModel):
+    routes: List[RouteOption] = Field(min_length=3, max_length=3, description="Exactly 3 route options")
+
+class ResourceEstimate(BaseModel):
+    forklifts: int = Field(ge=0)
+    trucks: int = Field(ge=0)
+    labour: int = Field(ge=0)
+
+class ProductObservation(BaseModel):
+    product_id: Optional[int] = Field(None, description="Row to update; matched on name and category when omitted")
+    name: str
+    category: str
+    features: Dict[str, Union[float, str]] = Field(description="Feature name to value, e.g. {\"Stocks Required\": 320}")
+
+class MonthIngest(BaseModel):
+    month: date
+    products: List[ProductObservation]
+
+class ProductHistory(BaseModel):
+    product_id: Optional[int] = None
+    name: str
+    category: str
+    months: Dict[date, Dict[str, Union[float, str]]]
+
+class ProductsIngest(BaseModel):
+    products: List[ProductHistory]
+
+class Perturbation(BaseModel):
+    feature: str = Field(description="One of the model features, e.g. 'Lead time (in days)'")
+    scale: Optional[float] = Field(None, description="Multiply the feature, e.g. 1.2 for +20%")
+    shift: Optional[float] = Field(None, description="Add to the feature")
+    value: Optional[Union[float, str]] = Field(None, description="Replace the feature, e.g. 'best' for Seasonality")
+
+class Scenario(BaseModel):
+    name: str
+    perturbations: List[Perturbation] = Field(min_length=1)
+
+class WhatIfInput(BaseModel):
+    products: List[str]
+    scenarios: List[Scenario] = Field(default_factory=list, max_length=50)
+    sensitivity: bool = False
+    anchor: Optional[date] = None
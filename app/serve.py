@@ -0,0 +1,167 @@
+"""
+Pre-forking server: loads the shared state once, then forks uvicorn workers that serve
+one listening socket.
+
+    python -m app.serve --workers 4 --port 10000
+
+The master imports TensorFlow, Keras, Prophet and pandas and loads the feature store,
+catalog, Prophet forecasts and encoders before forking, so every worker shares those
+pages copy-on-write instead of holding its own copy. The Keras model is loaded in each
+worker after the fork: TensorFlow's runtime is not fork-safe once it has started, and
+the weights are small next to the libraries. Crashed workers are restarted; SIGTERM and
+SIGINT are forwarded to the workers for a graceful shutdown.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+from typing import Callable, Optional
+import argparse
+import signal
+import socket
+import traceback
+import time
+import gc
+import os
+
+# Seconds to wait before restarting a worker that exited, so a crash loop does not spin
+RESTART_DELAY = 1
+
+
+def preload():
+    """
+    Loads everything that is safe to share across a fork.
+    """
+    # Importing starts no TensorFlow threads; the first op or model load does
+    import tensorflow  # noqa: F401
+    import keras  # noqa: F401
+    import prophet  # noqa: F401
+    # Library code only: the LLM clients hold connection pools (and gRPC channels) that must
+    # be created after the fork
+    import langgraph.graph  # noqa: F401
+    import langchain_core.messages  # noqa: F401
+    import selenium.webdriver  # noqa: F401
+
+    from app.models.feature_store import feature_store
+    from app.models.forecast_store import store
+    from app.models.windowing import prophet_config
+    from app.tools.road_graph import road_graph
+    from app.catalog import catalog
+
+    feature_store.load()
+    feature_store.frame()
+    catalog()
+    store.get("")
+    prophet_config()
+    road_graph()
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, workers: int, log_level: str):
+    """
+    Serves app.main on sock until uvicorn exits. Runs in the forked child.
+    """
+    import uvicorn
+    import tensorflow as tf
+
+    # Split the cores between the workers rather than letting each one use all of them
+    cores = max(1, (os.cpu_count() or 1) // workers)
+    os.environ.setdefault("INFERENCE_WORKERS", str(max(1, cores // 2)))
+    tf.config.threading.set_intra_op_parallelism_threads(cores)
+
+    config = uvicorn.Config("app.main:app", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(
+    host: str = "0.0.0.0",
+    port: int = 10000,
+    workers: int = 2,
+    log_level: str = "info",
+    setup: Optional[Callable[[], None]] = None
+):
+    """
+    Preloads, forks the workers and supervises them until SIGTERM or SIGINT.
+
+    Args:
+        host: Address to listen on.
+        port: Port to listen on.
+        workers: Number of worker processes.
+        log_level: uvicorn log level.
+        setup: Called in the master before preloading, e.g. to install benchmark stubs.
+    """
+    if setup:
+        setup()
+    started = time.perf_counter()
+    preload()
+    print(f"Preloaded shared state in {time.perf_counter() - started:.1f}s")
+
+    sock = bind(host, port)
+    # Keep the collector from touching (and so copying) the preloaded objects in the workers
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            status = 1
+            try:
+                run_worker(sock, workers, log_level)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        children.add(pid)
+        print(f"Started worker {pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                spawn()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 10000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", 2)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers, args.log_level)
@@ -0,0 +1,112 @@
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
+from app import metrics
+import json
+import os
+
+REPAIR_ATTEMPTS = int(os.getenv("STRUCTURED_OUTPUT_REPAIR_ATTEMPTS", 1))
+
+REPAIR_PROMPT = """Your answer did not satisfy the schema.
+
+Output:
+{output}
+
+Error:
+{error}
+
+Rewrite the output so it satisfies the schema, keeping all of its information.
+If the error says items are missing, complete them only from the conversation above; never make up data."""
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def structured(llm, schema: type[BaseModel]):
+    """
+    Wraps a chat model so it returns the raw message and the parsed schema instance.
+    """
+    return llm.with_structured_output(schema, include_raw=True)
+
+
+def _raw_text(raw) -> str:
+    if raw is None:
+        return ""
+    if getattr(raw, "tool_calls", None):
+        return json.dumps(raw.tool_calls[0]["args"])
+    if isinstance(raw.content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in raw.content)
+    return raw.content
+
+
+def _repair_messages(messages: list, result: dict) -> list:
+    # The original conversation holds the data (e.g. the tool results) missing items must come from
+    return list(messages) + [
+        HumanMessage(content=REPAIR_PROMPT.format(output=_raw_text(result['raw']), error=result['parsing_error']))
+    ]
+
+
+def _parsed(result: dict, name: str):
+    metrics.inc("structured_output_calls_total", call=name)
+    if result.get("parsed") is None:
+        metrics.inc("structured_output_parse_failures_total", call=name)
+        if result.get("parsing_error") is None:
+            result["parsing_error"] = "No structured output was returned"
+    return result.get("parsed")
+
+
+def _give_up(result: dict, name: str):
+    metrics.inc("structured_output_unrecovered_total", call=name)
+    raise StructuredOutputError(f"{name}: {result['parsing_error']}")
+
+
+def invoke_structured(structured_llm, messages, name: str) -> BaseModel:
+    """
+    Invokes a structured chat model and repairs its output if it does not match the schema.
+
+    Only the failed call is retried: the malformed output and the validation error are sent
+    back to the same model after the original messages, up to REPAIR_ATTEMPTS times.
+
+    Args:
+        structured_llm: A model wrapped with structured().
+        messages: The prompt for the first attempt.
+        name: Call name used to label the parse metrics.
+
+    Returns:
+        BaseModel: The parsed schema instance.
+
+    Raises:
+        StructuredOutputError: If the output still does not parse after the repairs.
+    """
+    result = structured_llm.invoke(messages)
+    parsed = _parsed(result, name)
+
+    for _ in range(REPAIR_ATTEMPTS):
+        if parsed is not None:
+            break
+        metrics.inc("structured_output_repairs_total", call=name)
+        result = structured_llm.invoke(_repair_messages(messages, result))
+        parsed = _parsed(result, name)
+
+    if parsed is None:
+        _give_up(result, name)
+    return parsed
+
+
+async def ainvoke_structured(structured_llm, messages, name: str) -> BaseModel:
+    """
+    Async version of invoke_structured().
+    """
+    result = await structured_llm.ainvoke(messages)
+    parsed = _parsed(result, name)
+
+    for _ in range(REPAIR_ATTEMPTS):
+        if parsed is not None:
+            break
+        metrics.inc("structured_output_repairs_total", call=name)
+        result = await structured_llm.ainvoke(_repair_messages(messages, result))
+        parsed = _parsed(result, name)
+
+    if parsed is None:
+        _give_up(result, name)
+    return parsed
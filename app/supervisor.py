@@ -0,0 +1,398 @@
+"""
+Supervision of the browsers the scrapers start, and of the memory of the app's processes.
+
+Every browser is started through browser(), which tracks its chromedriver process and,
+when the scrape ends, quits it and kills whatever quit() left running. A background
+thread samples the resident memory of this process and its children (Chrome included)
+and every SUPERVISOR_INTERVAL seconds kills:
+- browser processes nobody tracks, e.g. renderers left behind by a crashed chromedriver;
+- browsers running for longer than BROWSER_MAX_AGE, i.e. scrapes that are stuck.
+
+Memory above SCRAPE_SHED_RATIO of MEMORY_CEILING_MB pauses scraping (new browsers are
+refused); above the ceiling itself the running browsers are killed and model inference
+is refused with a 503 too, until memory is back under it.
+
+The peak memory of the process tree while a request runs, above its memory when the
+request started, is recorded per route in http_request_peak_rss_delta_mb. It is
+process-wide: concurrent requests each see the growth caused by all of them.
+
+Linux only, as it reads /proc. Elsewhere browsers are still quit, but nothing is
+sampled or reaped.
+"""
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Optional
+from app import metrics
+import itertools
+import ctypes
+import signal
+import time
+import os
+
+SUPERVISED = os.path.isdir("/proc/self")
+
+
+def _cgroup_limit_mb() -> float:
+    # cgroup v2, then v1; v1 reports a huge number when there is no limit
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                limit = int(f.read().strip()) / 2 ** 20
+        except (OSError, ValueError):
+            continue
+        return limit if limit < 2 ** 40 else 0.0
+    return 0.0
+
+
+# MB of resident memory the app and its browsers may use; defaults to 90% of the
+# container's memory limit, none without one. With several server workers every worker
+# enforces it on its own processes, so set it to the limit divided by the workers.
+MEMORY_CEILING_MB = float(os.getenv("MEMORY_CEILING_MB", 0)) or 0.9 * _cgroup_limit_mb()
+
+# Share of the ceiling above which no new scrapes start
+SCRAPE_SHED_RATIO = float(os.getenv("SCRAPE_SHED_RATIO", 0.8))
+
+# Seconds between sweeps for leaked browsers, and between memory samples
+SUPERVISOR_INTERVAL = float(os.getenv("SUPERVISOR_INTERVAL", 5))
+MEMORY_SAMPLE_INTERVAL = 0.25
+
+# Seconds after which a browser is considered stuck; above Selenium's 300 s page load timeout
+BROWSER_MAX_AGE = float(os.getenv("BROWSER_MAX_AGE", 600))
+
+# Untracked browser processes younger than this may belong to a browser still starting
+ORPHAN_GRACE_SECONDS = 30
+
+BROWSER_PROCESS_PREFIXES = ("chrome", "chromium", "headless_shell")
+
+# Upper bounds (MB) of the buckets of http_request_peak_rss_delta_mb
+MEMORY_BUCKETS_MB = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if SUPERVISED else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if SUPERVISED else 100
+
+# prctl option making orphaned descendants reparent to this process instead of init,
+# so that browsers outliving their chromedriver can still be found and killed
+PR_SET_CHILD_SUBREAPER = 36
+
+
+class ScrapingPaused(Exception):
+    def __init__(self):
+        super().__init__("Memory is running low, scraping is paused. Try again later.")
+
+
+def _processes() -> dict:
+    """
+    pid -> (ppid, command name, state, start time in clock ticks after boot) of every process.
+    """
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may itself contain spaces and parentheses
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        processes[int(entry)] = (int(fields[1]), name, fields[0], int(fields[19]))
+    return processes
+
+
+def _descendants(pid: int, processes: dict) -> list[int]:
+    children = {}
+    for child, (parent, *_) in processes.items():
+        children.setdefault(parent, []).append(child)
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _uptime() -> float:
+    with open("/proc/uptime") as f:
+        return float(f.read().split()[0])
+
+
+def _is_browser(name: str) -> bool:
+    return name.lower().startswith(BROWSER_PROCESS_PREFIXES)
+
+
+def _driver_pid(driver) -> Optional[int]:
+    # The chromedriver process of a local Selenium driver; Chrome runs as its child
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+
+def _kill(processes: list[tuple]) -> int:
+    """
+    SIGKILLs every (pid, start time) still running, skipping pids reused by other
+    processes since, and collects those that were children of this process. Returns
+    how many were still alive.
+    """
+    current = _processes()
+    killed = 0
+    for pid, started in processes:
+        if current.get(pid, (None, None, None, None))[3] != started:
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            continue
+        # Zombies have exited already and only need collecting
+        if current[pid][2] != "Z":
+            killed += 1
+        if current[pid][0] == os.getpid():
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+    return killed
+
+
+class Browser:
+    """
+    A driver handed out by browser(), with its processes.
+    """
+    def __init__(self, driver, pid: Optional[int]):
+        self.driver = driver
+        self.pid = pid
+        self.started = time.monotonic()
+
+    def processes(self) -> list[tuple]:
+        """
+        (pid, start time) of the chromedriver process and everything it started.
+        """
+        if self.pid is None or not SUPERVISED:
+            return []
+        processes = _processes()
+        return [(pid, processes[pid][3]) for pid in [self.pid, *_descendants(self.pid, processes)] if pid in processes]
+
+
+class Supervisor:
+    """
+    Tracks the browsers in use and the memory of the process tree.
+
+    The memory level is 0 below the scraping share of the ceiling, 1 between it and the
+    ceiling (scraping paused) and 2 above the ceiling (inference paused too).
+    """
+    def __init__(self, ceiling_mb: float = MEMORY_CEILING_MB, interval: float = SUPERVISOR_INTERVAL):
+        self.ceiling_mb = ceiling_mb
+        self.interval = interval
+        self.lock = Lock()
+        self.browsers = {}
+        self.requests = {}
+        self.tokens = itertools.count()
+        self.rss_mb = None
+        self.level = 0
+        self.stopping = Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None or not SUPERVISED:
+            return
+        try:
+            ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+        except (OSError, AttributeError) as e:
+            print("Could not become a subreaper, orphaned browsers will not be found:", e)
+        self.stopping.clear()
+        self.thread = Thread(target=self._run, name="supervisor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        with self.lock:
+            browsers = list(self.browsers.values())
+        for browser in browsers:
+            self._shed(browser, "shutdown")
+        # Anything left would outlive the app, reparented to init
+        if SUPERVISED:
+            self.reap(grace=0)
+
+    @property
+    def scraping_paused(self) -> bool:
+        return self.level >= 1
+
+    @property
+    def over_ceiling(self) -> bool:
+        return self.level >= 2
+
+    @contextmanager
+    def browser(self, start: Callable[[], Any]):
+        """
+        Starts a browser with start(), e.g. lambda: webdriver.Chrome(options=options), and
+        quits it when the block exits, killing whatever quit() left running.
+
+        Raises:
+            ScrapingPaused: When memory is above the scraping share of the ceiling.
+        """
+        if self.scraping_paused:
+            metrics.inc("supervisor_shed_total", stage="scrape")
+            raise ScrapingPaused()
+
+        driver = start()
+        browser = Browser(driver, _driver_pid(driver))
+        with self.lock:
+            self.browsers[id(browser)] = browser
+        metrics.inc("supervisor_browsers_started_total")
+        try:
+            yield driver
+        finally:
+            with self.lock:
+                self.browsers.pop(id(browser), None)
+            self._quit(browser, "quit")
+
+    def _quit(self, browser: Browser, reason: str):
+        # Listed before quitting: once chromedriver exits, Chrome is no longer its child
+        processes = browser.processes()
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print("Browser quit failed:", e)
+        killed = _kill(processes)
+        if killed:
+            metrics.inc("supervisor_reaped_total", killed, reason=reason)
+
+    def _shed(self, browser: Browser, reason: str):
+        """
+        Kills a browser still in use; the scrape using it fails.
+        """
+        with self.lock:
+            if self.browsers.pop(id(browser), None) is None:
+                return
+        processes = browser.processes()
+        if processes:
+            metrics.inc("supervisor_reaped_total", _kill(processes), reason=reason)
+        else:
+            self._quit(browser, reason)
+
+    def sample(self) -> float:
+        """
+        Measures the RSS of the process tree (MB), updates the memory level and the peaks
+        of the requests in progress, and kills the browsers in use when above the ceiling.
+        """
+        processes = _processes()
+        rss_mb = sum(_rss_mb(pid) for pid in [os.getpid(), *_descendants(os.getpid(), processes)])
+
+        level = 0
+        if self.ceiling_mb and rss_mb > self.ceiling_mb:
+            level = 2
+        elif self.ceiling_mb and rss_mb > self.ceiling_mb * SCRAPE_SHED_RATIO:
+            level = 1
+
+        with self.lock:
+            if level != self.level:
+                print(f"Memory at {rss_mb:.0f} MB of {self.ceiling_mb:.0f} MB, level {self.level} -> {level}")
+            self.rss_mb = rss_mb
+            self.level = level
+            for peak in self.requests.values():
+                peak[1] = max(peak[1], rss_mb)
+            browsers = list(self.browsers.values()) if level == 2 else []
+
+        # Scraping goes first: its browsers are the memory that can be freed right away
+        for browser in browsers:
+            self._shed(browser, "memory")
+        return rss_mb
+
+    def reap(self, grace: Optional[float] = None) -> int:
+        """
+        Kills stuck browsers and browser processes no tracked browser owns that are older
+        than grace seconds (ORPHAN_GRACE_SECONDS by default). Returns how many processes
+        were killed.
+        """
+        grace = ORPHAN_GRACE_SECONDS if grace is None else grace
+        with self.lock:
+            browsers = list(self.browsers.values())
+
+        now = time.monotonic()
+        owned = set()
+        for browser in browsers:
+            if now - browser.started > BROWSER_MAX_AGE:
+                self._shed(browser, "expired")
+            else:
+                owned.update(pid for pid, _ in browser.processes())
+
+        processes = _processes()
+        uptime = _uptime()
+        orphans = [
+            (pid, processes[pid][3]) for pid in _descendants(os.getpid(), processes)
+            if pid not in owned and _is_browser(processes[pid][1])
+            # Zombies are dead already and only need collecting, whatever their age
+            and (processes[pid][2] == "Z" or uptime - processes[pid][3] / CLOCK_TICKS >= grace)
+        ]
+        killed = _kill(orphans)
+        if killed:
+            metrics.inc("supervisor_reaped_total", killed, reason="orphan")
+        return killed
+
+    def _run(self):
+        last_reap = time.monotonic()
+        while not self.stopping.wait(MEMORY_SAMPLE_INTERVAL):
+            try:
+                self.sample()
+                if time.monotonic() - last_reap >= self.interval:
+                    last_reap = time.monotonic()
+                    self.reap()
+            except Exception as e:
+                print("Supervisor sweep failed:", e)
+
+    def begin_request(self) -> int:
+        # Without the sampling thread (e.g. outside the app's lifespan) the request is
+        # measured at its start and end only
+        rss_mb = self.rss_mb if self.thread is not None and self.rss_mb is not None else self.sample()
+        with self.lock:
+            token = next(self.tokens)
+            self.requests[token] = [rss_mb, rss_mb]
+        return token
+
+    def end_request(self, token: int) -> float:
+        """
+        The peak RSS above the request's start (MB) while it ran.
+        """
+        if self.thread is None:
+            self.sample()
+        with self.lock:
+            baseline, peak = self.requests.pop(token)
+        return max(0.0, peak - baseline)
+
+
+class MemoryMiddleware:
+    """
+    ASGI middleware recording http_request_peak_rss_delta_mb per route.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SUPERVISED:
+            return await self.app(scope, receive, send)
+
+        token = supervisor.begin_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            metrics.observe(
+                "http_request_peak_rss_delta_mb",
+                supervisor.end_request(token),
+                buckets=MEMORY_BUCKETS_MB,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched")
+            )
+
+
+supervisor = Supervisor()
@@ -5,19 +5,23 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from geopy.distance import geodesic
 from typing import List, Dict
 import time
+from app.tracing import traced
+from app.tools.scrape_cache import scrape_cache
+from app.supervisor import supervisor, ScrapingPaused
+from app import geo, deadline, prefetch
 
 def estimate_emission_kgs(distance_km: float) -> float:
     """
     Estimate CO₂ emissions using the average value of 90g CO₂ per passenger-km for flights.
     """
-    return round(distance_km * 0.09, 2)
+    return geo.emission_kg("air", distance_km)
 
 def estimate_distance_km(src_coords: tuple, dst_coords: tuple) -> float:
-    return round(geodesic(src_coords, dst_coords).km, 2)
+    return geo.distance_km(src_coords, dst_coords)
 
+@traced("tool.airways")
 def get_airways_route_info(
     source_code: str,
     destination_code: str,
@@ -48,9 +52,35 @@ def get_airways_route_info(
     print("Executing airways tool") 
     # print({source_code, destination_code, source_lat, source_lng, dest_lat, dest_lnge})
 
+    source_code, destination_code = source_code.upper(), destination_code.upper()
+    prefetch.consume("airways", source_code, destination_code)
+    try:
+        flights = fetch_flights(source_code, destination_code)
+    except ScrapingPaused as e:
+        return {"error": str(e)}
+
+    # Distance & Emission
+    distance = geo.leg_distance_km("air", source_code, destination_code, (source_lat, source_lng), (dest_lat, dest_lng))
+    emission = estimate_emission_kgs(distance)
+
+    return [{**flight, 'distance_km': distance, 'carbon_emission_kg': emission} for flight in flights]
+
+def fetch_flights(source_code: str, destination_code: str) -> list[dict]:
+    """
+    The parsed CheapFlights results for a lane a week from now, from the scrape cache or a fresh scrape.
+    """
     date = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
+    return scrape_cache.fetch(
+        "airways", source_code, destination_code, date,
+        lambda: scrape_flight_cards(source_code, destination_code, date),
+        parse_flights
+    )
 
-    url = f"https://www.in.cheapflights.com/flight-search/{source_code.upper()}-{destination_code.upper()}/{date}?sort=bestflight_a"
+def scrape_flight_cards(source_code: str, destination_code: str, date: str) -> list[str]:
+    """
+    Loads the CheapFlights results for a lane and date and returns the outerHTML of every result card.
+    """
+    url = f"https://www.in.cheapflights.com/flight-search/{source_code}-{destination_code}/{date}?sort=bestflight_a"
     print(url)
 
     options = Options()
@@ -61,27 +91,38 @@ def get_airways_route_info(
     # options.add_argument("--disable-blink-features=AutomationControlled")
     # options.add_experimental_option("excludeSwitches", ["enable-automation"])
 
-    driver = webdriver.Chrome(options=options)
-    driver.get(url)
-
-    try:
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_all_elements_located((By.CLASS_NAME, 'Fxw9-result-item-container'))
-        )
-    except Exception as e:
-        print("Timeout waiting for flights to load:", e)
-        driver.quit()
-        return []
-
-    elems = driver.find_elements(By.CLASS_NAME, 'Fxw9-result-item-container')
-    print(f"{len(elems)} flight items found")
-
+    # The supervisor quits the browser when the block exits, and kills what quit() leaves running
+    with supervisor.browser(lambda: webdriver.Chrome(options=options)) as driver:
+        try:
+            # Quitting the browser aborts a page load or wait blocked in this thread
+            with deadline.on_cancel(driver.quit):
+                # Selenium's default page load timeout, cut to the request's budget
+                driver.set_page_load_timeout(deadline.timeout(300))
+                driver.get(url)
+
+                try:
+                    WebDriverWait(driver, deadline.timeout(30)).until(
+                        EC.presence_of_all_elements_located((By.CLASS_NAME, 'Fxw9-result-item-container'))
+                    )
+                except Exception as e:
+                    deadline.check()
+                    print("Timeout waiting for flights to load:", e)
+                    return []
+
+                elems = driver.find_elements(By.CLASS_NAME, 'Fxw9-result-item-container')
+                print(f"{len(elems)} flight items found")
+                return [elem.get_attribute('outerHTML') for elem in elems]
+        except Exception:
+            # Report a browser stopped by cancellation as such
+            deadline.check()
+            raise
+
+def parse_flights(cards: list[str]) -> list[dict]:
+    """
+    Extracts duration, price and stops from up to 4 CheapFlights result cards.
+    """
     results = []
-    distance = estimate_distance_km((source_lat, source_lng), (dest_lat, dest_lng))
-    emission = estimate_emission_kgs(distance)
-
-    for elem in elems:
-        card_html = elem.get_attribute('outerHTML')
+    for card_html in cards:
         soup = BeautifulSoup(card_html, 'html.parser')
 
         content = {}
@@ -101,15 +142,10 @@ def get_airways_route_info(
         stops = soup.find_all('div', attrs={'class': 'c_cgF-mod-variant-full-airport'})
         content['stops'] = stops[1].get_text() if len(stops) == 3 else "None"
 
-        # Distance & Emission
-        content['distance_km'] = distance
-        content['carbon_emission_kg'] = emission
-
         results.append(content)
         if len(results) > 3:
             break
 
-    driver.quit()
     return results
 
 if __name__ == "__main__":
@@ -5,10 +5,16 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from geopy.distance import geodesic
-import time
-import asyncio
+from app.tracing import traced
+from app.tools.scrape_cache import scrape_cache
+from app.supervisor import supervisor, ScrapingPaused
+from app import geo, deadline, prefetch
 
+# Seconds for Ixigo to render the results after loading, and after scrolling to the end
+PAGE_SETTLE_SECONDS = 2
+SCROLL_SETTLE_SECONDS = 5
+
+@traced("tool.railways")
 def get_train_data(
     source_code: str,
     destination_code: str,
@@ -29,7 +35,33 @@ def get_train_data(
     Returns:
         List of train data with name, number, duration, fares, distance, and CO2 emission.
     """
+    prefetch.consume("railways", source_code, destination_code)
+    try:
+        trains = fetch_trains(source_code, destination_code)
+    except ScrapingPaused as e:
+        return {"error": str(e)}
+
+    # Distance & Emission
+    dist_km = geo.leg_distance_km("rail", source_code, destination_code, (source_lat, source_lng), (dest_lat, dest_lng))
+    co2_emission = geo.emission_kg("rail", dist_km)
+
+    return [{**train, 'distance_km': dist_km, 'estimated_emission_kg': co2_emission} for train in trains]
+
+def fetch_trains(source_code: str, destination_code: str) -> list[dict]:
+    """
+    The parsed Ixigo results for a route 20 days from now, from the scrape cache or a fresh scrape.
+    """
     date = (datetime.now() + timedelta(days=20)).strftime("%d%m%Y")
+    return scrape_cache.fetch(
+        "railways", source_code, destination_code, date,
+        lambda: scrape_train_cards(source_code, destination_code, date),
+        parse_trains
+    )
+
+def scrape_train_cards(source_code: str, destination_code: str, date: str) -> list[str]:
+    """
+    Loads the Ixigo results for a route and date (DDMMYYYY) and returns the outerHTML of every train row.
+    """
     url = f"https://www.ixigo.com/search/result/train/{source_code}/{destination_code}/{date}//1/0/0/0/ALL"
     
     options = Options()
@@ -38,27 +70,41 @@ def get_train_data(
     # options.add_argument('--no-sandbox')
     # options.add_argument('--disable-dev-shm-usage')
 
-    driver = webdriver.Chrome(options=options)
-    driver.get(url)
-    time.sleep(2)
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(5)
-
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CLASS_NAME, 'train-listing-row'))
-        )
-    except Exception as e:
-        print("❌ Train data not loaded:", e)
-        driver.quit()
-        return []
-
-    elems = driver.find_elements(By.CLASS_NAME, 'train-listing-row')
-    print(f"{len(elems)} trains found.")
-
+    # The supervisor quits the browser when the block exits, and kills what quit() leaves running
+    with supervisor.browser(lambda: webdriver.Chrome(options=options)) as driver:
+        try:
+            # Quitting the browser aborts a page load or wait blocked in this thread
+            with deadline.on_cancel(driver.quit):
+                # Selenium's default page load timeout, cut to the request's budget
+                driver.set_page_load_timeout(deadline.timeout(300))
+                driver.get(url)
+                deadline.sleep(PAGE_SETTLE_SECONDS)
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                deadline.sleep(SCROLL_SETTLE_SECONDS)
+
+                try:
+                    WebDriverWait(driver, deadline.timeout(10)).until(
+                        EC.presence_of_all_elements_located((By.CLASS_NAME, 'train-listing-row'))
+                    )
+                except Exception as e:
+                    deadline.check()
+                    print("❌ Train data not loaded:", e)
+                    return []
+
+                elems = driver.find_elements(By.CLASS_NAME, 'train-listing-row')
+                print(f"{len(elems)} trains found.")
+                return [elem.get_attribute('outerHTML') for elem in elems]
+        except Exception:
+            # Report a browser stopped by cancellation as such
+            deadline.check()
+            raise
+
+def parse_trains(cards: list[str]) -> list[dict]:
+    """
+    Extracts name, number, duration and fares per class from up to 3 Ixigo train rows.
+    """
     result = []
-    for elem in elems:
-        card_html = elem.get_attribute('outerHTML')
+    for card_html in cards:
         soup = BeautifulSoup(card_html, 'html.parser')
 
         content = {}
@@ -80,19 +126,11 @@ def get_train_data(
 
         content['price'] = fares
 
-        # Distance & Emission
-        dist_km = round(geodesic((source_lat, source_lng), (dest_lat, dest_lng)).km, 2)
-        co2_emission = round(dist_km * 0.041, 2)
-
-        content['distance_km'] = dist_km
-        content['estimated_emission_kg'] = co2_emission
-
         result.append(content)
 
         if len(result) >= 3:  # limit results for speed
             break
 
-    driver.quit()
     return result
 
 def get_railways_route_info(
@@ -123,7 +161,7 @@ def get_railways_route_info(
         - distance_km: Distance between stations in kilometers (float)
         - estimated_emission_kg: Estimated CO2 emissions in kilograms (float)
     """
-    asyncio.run(get_train_data(source_code, destination_code, source_lat, source_lng, dest_lat, dest_lng))
+    return get_train_data(source_code, destination_code, source_lat, source_lng, dest_lat, dest_lng)
 
 if __name__ == '__main__':
     print("test")
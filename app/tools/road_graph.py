@@ -0,0 +1,322 @@
+"""
+Offline road routing over a preprocessed road network.
+
+The network is a CSR (compressed sparse row) adjacency: the edges leaving node i are
+indices[indptr[i]:indptr[i + 1]], with their length, speed and road name in parallel
+arrays. Routes are found with A*, guided by the straight-line distance to the target.
+
+Build the compact .npz graph from GeoJSON, e.g. an OSM extract exported with
+`osmium export india-latest.osm.pbf -o roads.geojson` (LineStrings with highway, name,
+ref, maxspeed and oneway tags; Points with place and name tags become place names):
+
+    python -m app.tools.road_graph build roads.geojson app/tools/data/roads.npz
+    python -m app.tools.road_graph route app/tools/data/roads.npz Pune Mumbai
+"""
+from functools import lru_cache
+from typing import Optional
+from app import geo
+import numpy as np
+import argparse
+import heapq
+import json
+import os
+
+# Unset, roads are routed by OpenRouteService. The bundled app/tools/data/roads_sample.geojson
+# is a schematic network for the benchmarks, too coarse for real directions
+ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH")
+
+# km/h by OSM highway class, for ways without a usable maxspeed tag
+DEFAULT_SPEEDS = {
+    "motorway": 100,
+    "trunk": 80,
+    "primary": 60,
+    "secondary": 50,
+    "tertiary": 40,
+    "unclassified": 30,
+    "residential": 25,
+}
+
+# Coordinates are rounded to this many decimals (~10 cm) to join ways at shared vertices
+COORDINATE_DECIMALS = 6
+
+COMPASS = ["north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest"]
+
+
+def _speed(properties: dict) -> Optional[float]:
+    try:
+        return float(str(properties.get("maxspeed")).split()[0])
+    except (TypeError, ValueError, IndexError):
+        return DEFAULT_SPEEDS.get(properties.get("highway"))
+
+
+def _normalize(place: str) -> str:
+    # "Pune, Maharashtra" and "pune" both match the place "Pune"
+    return place.split(",")[0].strip().lower()
+
+
+def bearing(lat1, lng1, lat2, lng2) -> float:
+    """
+    Initial compass bearing in degrees from the first point to the second.
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    x = np.sin(lng2 - lng1) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lng2 - lng1)
+    return float(np.degrees(np.arctan2(x, y)) % 360)
+
+
+def _turn(change: float) -> str:
+    change = (change + 180) % 360 - 180
+    if abs(change) < 20:
+        return "Continue onto"
+    side = "right" if change > 0 else "left"
+    if abs(change) < 60:
+        return f"Keep {side} onto"
+    return f"Turn {side} onto"
+
+
+class RoadGraph:
+    """
+    Directed road network in CSR form.
+
+    Attributes:
+        lat, lng: (n,) node coordinates in degrees.
+        indptr: (n + 1,) offsets of each node's outgoing edges.
+        indices: (m,) target node of every edge.
+        length_m: (m,) edge lengths in metres.
+        speed_kmh: (m,) edge speeds.
+        road: (m,) index of each edge's road name in roads.
+        roads: Road names ('' for unnamed roads).
+        places: Normalized place name -> node.
+    """
+    def __init__(self, lat, lng, indptr, indices, length_m, speed_kmh, road, roads, places):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.length_m = np.asarray(length_m, dtype=np.float32)
+        self.speed_kmh = np.asarray(speed_kmh, dtype=np.float32)
+        self.road = np.asarray(road, dtype=np.int32)
+        self.roads = list(roads)
+        self.places = dict(places)
+        self.sources = np.repeat(np.arange(len(self.lat), dtype=np.int32), np.diff(self.indptr))
+        self.time_s = self.length_m / (self.speed_kmh / 3.6)
+        self.max_speed_ms = float(self.speed_kmh.max()) / 3.6 if len(self.speed_kmh) else 1.0
+
+    @classmethod
+    def from_geojson(cls, path: str) -> "RoadGraph":
+        """
+        Builds the graph from LineString ways and Point places. Every vertex of a way
+        becomes a node, and ways meet where they share a vertex.
+        """
+        with open(path) as f:
+            features = json.load(f)["features"]
+
+        nodes = {}
+        edges = []
+        roads = {"": 0}
+        place_points = {}
+
+        def node(coordinate):
+            key = (round(coordinate[1], COORDINATE_DECIMALS), round(coordinate[0], COORDINATE_DECIMALS))
+            return nodes.setdefault(key, len(nodes))
+
+        for feature in features:
+            geometry = feature.get("geometry") or {}
+            properties = feature.get("properties") or {}
+            if geometry.get("type") == "Point" and properties.get("place") and properties.get("name"):
+                for name in [properties["name"]] + str(properties.get("alt_name") or "").split(";"):
+                    if name:
+                        place_points.setdefault(_normalize(name), geometry["coordinates"])
+                continue
+
+            lines = {"LineString": [geometry.get("coordinates")], "MultiLineString": geometry.get("coordinates")}.get(geometry.get("type"))
+            speed = _speed(properties)
+            if not lines or speed is None:
+                continue
+
+            name = " ".join(part for part in (properties.get("ref"), properties.get("name")) if part)
+            road = roads.setdefault(name, len(roads))
+            oneway = properties.get("oneway")
+            for line in lines:
+                ids = [node(coordinate) for coordinate in line]
+                for a, b in zip(ids, ids[1:]):
+                    if a == b:
+                        continue
+                    if oneway == "-1":
+                        edges.append((b, a, speed, road))
+                    else:
+                        edges.append((a, b, speed, road))
+                        if oneway not in ("yes", "true", "1"):
+                            edges.append((b, a, speed, road))
+
+        coordinates = np.array(list(nodes), dtype=np.float64).reshape(-1, 2)
+        edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+        order = np.argsort(edges[:, 0], kind="stable")
+        edges = edges[order]
+        source, target = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+
+        lat, lng = coordinates[:, 0], coordinates[:, 1]
+        length_m = geo.haversine_km(lat[source], lng[source], lat[target], lng[target]) * 1000
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(coordinates)))])
+
+        graph = cls(lat, lng, indptr, target, length_m, edges[:, 2], edges[:, 3], list(roads), {})
+        graph.places = {name: graph.nearest(point[1], point[0]) for name, point in place_points.items()}
+        return graph
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        """
+        Loads a graph saved with save(), or builds one from a .geojson file.
+        """
+        if path.endswith(".geojson"):
+            return cls.from_geojson(path)
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["lat"], data["lng"], data["indptr"], data["indices"], data["length_m"],
+                data["speed_kmh"], data["road"], data["roads"].tolist(),
+                zip(data["place_names"].tolist(), data["place_nodes"].tolist())
+            )
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            lat=self.lat, lng=self.lng, indptr=self.indptr, indices=self.indices,
+            length_m=self.length_m, speed_kmh=self.speed_kmh, road=self.road,
+            roads=np.array(self.roads, dtype=str),
+            place_names=np.array(list(self.places), dtype=str),
+            place_nodes=np.array(list(self.places.values()), dtype=np.int64)
+        )
+
+    def nearest(self, lat: float, lng: float) -> int:
+        return int(np.argmin(geo.haversine_km(self.lat, self.lng, lat, lng)))
+
+    def geocode(self, place: str) -> Optional[int]:
+        """
+        The node of a known place name, or None.
+        """
+        return self.places.get(_normalize(place))
+
+    def shortest_path(self, source: int, target: int, weight: str = "time") -> Optional[list[int]]:
+        """
+        A* search from source to target.
+
+        Args:
+            source: Start node.
+            target: End node.
+            weight: 'time' for the fastest route, 'distance' for the shortest one.
+
+        Returns:
+            list: The edge indices of the route, or None when target is unreachable.
+        """
+        if weight not in ("time", "distance"):
+            raise ValueError(f"Unknown weight: {weight}, expected 'time' or 'distance'")
+        cost = self.time_s if weight == "time" else self.length_m
+
+        # Straight-line distance never exceeds the road distance, so the heuristic is admissible
+        remaining_m = geo.haversine_km(self.lat, self.lng, self.lat[target], self.lng[target]) * 1000
+        heuristic = remaining_m / self.max_speed_ms if weight == "time" else remaining_m
+
+        best = {source: 0.0}
+        via = {}
+        done = set()
+        queue = [(float(heuristic[source]), source)]
+        while queue:
+            _, node = heapq.heappop(queue)
+            if node == target:
+                break
+            if node in done:
+                continue
+            done.add(node)
+
+            start, end = self.indptr[node], self.indptr[node + 1]
+            for edge, neighbour, step in zip(range(start, end), self.indices[start:end].tolist(), cost[start:end].tolist()):
+                candidate = best[node] + step
+                if candidate < best.get(neighbour, np.inf):
+                    best[neighbour] = candidate
+                    via[neighbour] = edge
+                    heapq.heappush(queue, (candidate + float(heuristic[neighbour]), neighbour))
+        else:
+            return None
+
+        edges = []
+        node = target
+        while node != source:
+            edges.append(via[node])
+            node = int(self.sources[via[node]])
+        return edges[::-1]
+
+    def instructions(self, edges: list[int], destination: str) -> list[str]:
+        """
+        Turn-by-turn instructions for a route: one per change of road, then the arrival.
+        """
+        steps = []
+        previous_road = None
+        previous_bearing = None
+        for edge in edges:
+            source, target = self.sources[edge], self.indices[edge]
+            heading = bearing(self.lat[source], self.lng[source], self.lat[target], self.lng[target])
+            road = self.road[edge]
+            if road != previous_road:
+                name = self.roads[road] or "unnamed road"
+                if previous_road is None:
+                    steps.append(f"Head {COMPASS[int((heading + 22.5) // 45) % 8]} on {name}")
+                else:
+                    steps.append(f"{_turn(heading - previous_bearing)} {name}")
+            previous_road, previous_bearing = road, heading
+        steps.append(f"Arrive at {destination}")
+        return steps
+
+    def route(self, source: str, destination: str, weight: str = "time") -> Optional[dict]:
+        """
+        Routes between two place names, in the shape of the roadways tool's result.
+
+        Returns:
+            dict: route_steps, total_distance_km, estimated_time_min and estimated_emission_kg,
+                  or None when a place is unknown or no road connects them.
+        """
+        src, dst = self.geocode(source), self.geocode(destination)
+        if src is None or dst is None:
+            return None
+        edges = self.shortest_path(src, dst, weight)
+        if edges is None:
+            return None
+
+        distance_km = float(self.length_m[edges].sum()) / 1000
+        duration_s = float(self.time_s[edges].sum())
+        return {
+            "route_steps": self.instructions(edges, destination),
+            "total_distance_km": round(distance_km, 2),
+            "estimated_time_min": round(duration_s / 60, 2),
+            "estimated_emission_kg": geo.emission_kg("road", distance_km)
+        }
+
+
+@lru_cache
+def road_graph() -> Optional[RoadGraph]:
+    """
+    The graph at ROAD_GRAPH_PATH, loaded once, or None when it is not set or there is no such file.
+    """
+    if not ROAD_GRAPH_PATH or not os.path.exists(ROAD_GRAPH_PATH):
+        return None
+    return RoadGraph.load(ROAD_GRAPH_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Convert a GeoJSON road network into a .npz graph")
+    build.add_argument("geojson")
+    build.add_argument("output")
+    route = commands.add_parser("route", help="Route between two place names")
+    route.add_argument("graph")
+    route.add_argument("source")
+    route.add_argument("destination")
+    route.add_argument("--weight", choices=["time", "distance"], default="time")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        graph = RoadGraph.from_geojson(args.geojson)
+        graph.save(args.output)
+        print(f"Saved {len(graph.lat)} nodes, {len(graph.indices)} edges and {len(graph.places)} places to {args.output}")
+    else:
+        print(json.dumps(RoadGraph.load(args.graph).route(args.source, args.destination, args.weight), indent=2))
@@ -1,10 +1,25 @@
 import openrouteservice
 from typing import Dict, Any
+from starlette.concurrency import run_in_threadpool
 import asyncio
 import os
+from app.tracing import traced, span
+from app.tools.road_graph import road_graph
+from app import geo, metrics
 
 client = openrouteservice.Client(key=os.getenv("OPEN_ROUTE_SERVICES_API_KEY"))
 
+# 'auto' routes offline over the local road graph, when ROAD_GRAPH_PATH is set, and falls back
+# to OpenRouteService for places the graph does not know; 'local' and 'ors' use only one of them
+ROAD_ROUTING = os.getenv("ROAD_ROUTING", "auto")
+
+def local_route(source: str, destination: str):
+    graph = road_graph()
+    if graph is None:
+        return None
+    return graph.route(source, destination)
+
+@traced("tool.roadways")
 async def get_road_data(source: str, destination: str) -> Dict[str, Any]:
     """Get comprehensive driving route information between two locations including turn-by-turn directions.
     
@@ -28,22 +43,34 @@ async def get_road_data(source: str, destination: str) -> Dict[str, Any]:
         If an error occurs (invalid locations, network issues, etc.), returns:
         - error: String description of the error that occurred
     
-    Note: This tool requires internet connectivity and uses OpenRouteService's geocoding and routing services.
+    Note: Cities on the local road network are routed offline; other locations use OpenRouteService's geocoding and routing services.
     Travel times are estimates based on typical driving conditions and may vary due to traffic, weather, or road conditions.
     """
     print("Execute roadways tool")
 
+    if ROAD_ROUTING != "ors":
+        with span("roadways.local"):
+            result = await run_in_threadpool(local_route, source, destination)
+        if result is not None:
+            metrics.inc("roadways_backend_total", backend="local")
+            return result
+        if ROAD_ROUTING == "local":
+            return {"error": "No offline road route between these locations. Try a nearby city name."}
+
+    metrics.inc("roadways_backend_total", backend="ors")
     try:
         # Get coordinates using OpenRouteService geocoding
-        src_coords = client.pelias_search(source)["features"][0]["geometry"]["coordinates"]
-        dst_coords = client.pelias_search(destination)["features"][0]["geometry"]["coordinates"]
+        with span("roadways.geocode"):
+            src_coords = client.pelias_search(source)["features"][0]["geometry"]["coordinates"]
+            dst_coords = client.pelias_search(destination)["features"][0]["geometry"]["coordinates"]
 
         # Get optimal driving route
-        route = client.directions(
-            coordinates=[src_coords, dst_coords],
-            profile='driving-car',
-            format='geojson'
-        )
+        with span("roadways.directions"):
+            route = client.directions(
+                coordinates=[src_coords, dst_coords],
+                profile='driving-car',
+                format='geojson'
+            )
 
         # Extract route segment data
         segment = route['features'][0]['properties']['segments'][0]
@@ -57,7 +84,7 @@ async def get_road_data(source: str, destination: str) -> Dict[str, Any]:
         # Calculate environmental impact
         # Using average car emission factor: 0.192 kg CO2 per kilometer
         distance_km = distance_m / 1000
-        emission_kg = round(distance_km * 0.192, 2)
+        emission_kg = geo.emission_kg("road", distance_km)
 
         return {
             "route_steps": instructions,
@@ -94,7 +121,7 @@ def get_roadways_route_info(source: str, destination: str) -> Dict[str, Any]:
         If an error occurs (invalid locations, network issues, etc.), returns:
         - error: String description of the error that occurred
     
-    Note: This tool requires internet connectivity and uses OpenRouteService's geocoding and routing services.
+    Note: Cities on the local road network are routed offline; other locations use OpenRouteService's geocoding and routing services.
     Travel times are estimates based on typical driving conditions and may vary due to traffic, weather, or road conditions.
     """
-    asyncio.run(get_road_data(source, destination))
\ No newline at end of file
+    return asyncio.run(get_road_data(source, destination))
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Persistent cache for the flight and train scrapers.
+
+Every scrape is stored with its raw result cards and their parsed form, keyed by
+(mode, source code, destination code, travel date). Parsers can be re-run over the
+stored HTML after a fix, without scraping again:
+
+    python -m app.tools.scrape_cache --reparse airways
+"""
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable
+from threading import Lock
+from app.deadline import DeadlineExceeded
+from app import metrics, deadline
+import argparse
+import sqlite3
+import json
+import time
+import os
+
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", "app/tools/scrape_cache.db")
+
+# Seconds a scrape stays fresh, per mode; fares move faster than timetables
+SCRAPE_TTL = {
+    "airways": int(os.getenv("SCRAPE_TTL_AIRWAYS", 3600)),
+    "railways": int(os.getenv("SCRAPE_TTL_RAILWAYS", 6 * 3600)),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrapes (
+    mode TEXT NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    travel_date TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    html TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    PRIMARY KEY (mode, source, destination, travel_date)
+);
+"""
+
+
+class ScrapeCache:
+    """
+    SQLite store of scrape results with per-mode TTLs.
+
+    Concurrent requests for the same key share one scrape: the first caller scrapes and
+    the others wait for its result.
+    """
+    def __init__(self, path: str = SCRAPE_CACHE_PATH, ttl: dict = SCRAPE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = Lock()
+        self.inflight = {}
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, mode: str, source: str, destination: str, travel_date: str):
+        """
+        The parsed result of a fresh scrape, or None.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT scraped_at, parsed FROM scrapes WHERE mode = ? AND source = ? AND destination = ? AND travel_date = ?",
+                (mode, source, destination, travel_date)
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl.get(mode, 0):
+            return None
+        return json.loads(row[1])
+
+    def put(self, mode: str, source: str, destination: str, travel_date: str, cards: list[str], parsed: list):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scrapes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (mode, source, destination, travel_date, time.time(), json.dumps(cards), json.dumps(parsed))
+            )
+
+    def fetch(
+        self,
+        mode: str,
+        source: str,
+        destination: str,
+        travel_date: str,
+        scrape: Callable[[], list[str]],
+        parse: Callable[[list[str]], list]
+    ) -> list:
+        """
+        Returns the parsed scrape for the key, scraping only when there is no fresh entry
+        and no other caller is already scraping it.
+
+        Args:
+            mode: 'airways' or 'railways', selects the TTL.
+            source: Source airport or station code.
+            destination: Destination airport or station code.
+            travel_date: Travel date as scraped, e.g. '2025-01-08'.
+            scrape: Returns the outerHTML of every result card.
+            parse: Turns the cards into the tool's results.
+
+        Returns:
+            list: The parsed results. Empty scrapes (e.g. a page that never loaded) are not cached.
+        """
+        key = (mode, source, destination, travel_date)
+        while True:
+            cached = self.get(*key)
+            if cached is not None:
+                metrics.inc("scrape_cache_hits_total", mode=mode)
+                return cached
+
+            with self.lock:
+                future = self.inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self.inflight[key] = Future()
+
+            if leader:
+                break
+
+            metrics.inc("scrape_cache_coalesced_total", mode=mode)
+            try:
+                return deadline.result(future)
+            except DeadlineExceeded:
+                # The scrape was cut short by its own request's budget; scrape again if ours allows
+                deadline.check()
+
+        metrics.inc("scrape_cache_misses_total", mode=mode)
+        try:
+            cards = scrape()
+            parsed = parse(cards)
+            if cards:
+                self.put(*key, cards, parsed)
+            future.set_result(parsed)
+            return parsed
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def reparse(self, mode: str, parse: Callable[[list[str]], list]) -> int:
+        """
+        Re-runs parse over the stored HTML of every scrape of mode and returns how many were updated.
+        Scrape times are kept, so re-parsing does not extend the TTL.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT rowid, html FROM scrapes WHERE mode = ?", (mode,)).fetchall()
+            conn.executemany(
+                "UPDATE scrapes SET parsed = ? WHERE rowid = ?",
+                [(json.dumps(parse(json.loads(html))), rowid) for rowid, html in rows]
+            )
+        return len(rows)
+
+
+scrape_cache = ScrapeCache()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reparse", choices=["airways", "railways"], required=True)
+    args = parser.parse_args()
+
+    if args.reparse == "airways":
+        from app.tools.airways import parse_flights as parse
+    else:
+        from app.tools.railways import parse_trains as parse
+    print(f"Re-parsed {scrape_cache.reparse(args.reparse, parse)} {args.reparse} scrapes")
@@ -1,7 +1,57 @@
 from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-from typing import Dict
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Dict, Optional
+from app.tracing import traced, span
+from app import geo, deadline, prefetch
 
+# Places geocoded so far, least recently used first (ports do not move); a place being
+# looked up maps to the Future its result will be set on. The places come from the LLM,
+# so only the GEOCODE_CACHE_SIZE most recent ones are kept
+GEOCODE_CACHE_SIZE = 1024
+_geocodes = OrderedDict()
+_geocodes_lock = Lock()
+
+def _forget(place: str, future: Future):
+    with _geocodes_lock:
+        # Unless a newer lookup of the place replaced it after an eviction
+        if _geocodes.get(place) is future:
+            del _geocodes[place]
+
+def geocode(place: str) -> Optional[tuple]:
+    """
+    (latitude, longitude) of a place from Nominatim, or None when it is not found.
+    Concurrent lookups of the same place share one request.
+    """
+    with _geocodes_lock:
+        future = _geocodes.get(place)
+        leader = future is None
+        if leader:
+            future = _geocodes[place] = Future()
+            if len(_geocodes) > GEOCODE_CACHE_SIZE:
+                _geocodes.popitem(last=False)
+        else:
+            _geocodes.move_to_end(place)
+
+    if not leader:
+        return deadline.result(future)
+
+    try:
+        location = Nominatim(user_agent="seaway_route_calculator").geocode(place)
+        coords = (location.latitude, location.longitude) if location else None
+        future.set_result(coords)
+        # Neither are places that were not found, e.g. a misspelling the next call may fix
+        if coords is None:
+            _forget(place, future)
+        return coords
+    except BaseException as e:
+        # Failures are not cached: the next lookup asks again
+        _forget(place, future)
+        future.set_exception(e)
+        raise
+
+@traced("tool.seaways")
 def get_seaways_route_info(
     source_port: str,
     destination_port: str,
@@ -38,20 +88,18 @@ def get_seaways_route_info(
     print("Executing seasways tool")
     # print({source_port, destination_port, freight_rate_per_tonne_km, cargo_tonnage})
 
-    geolocator = Nominatim(user_agent="seaway_route_calculator")
-
     try:
-        src_location = geolocator.geocode(source_port)
-        dst_location = geolocator.geocode(destination_port)
+        prefetch.consume("seaways", source_port)
+        prefetch.consume("seaways", destination_port)
+        with span("seaways.geocode"):
+            src_coords = geocode(source_port)
+            dst_coords = geocode(destination_port)
 
-        if not src_location or not dst_location:
+        if not src_coords or not dst_coords:
             return {"error": "Could not geocode one or both ports."}
 
-        src_coords = (src_location.latitude, src_location.longitude)
-        dst_coords = (dst_location.latitude, dst_location.longitude)
-
-        distance_km = geodesic(src_coords, dst_coords).km
-        estimated_emission_kg = round(distance_km * cargo_tonnage * 0.02, 2)
+        distance_km = float(geo.vincenty_km(*src_coords, *dst_coords))
+        estimated_emission_kg = geo.emission_kg("sea", distance_km, cargo_tonnage)
         estimated_price_usd = round(distance_km * cargo_tonnage * freight_rate_per_tonne_km, 2)
 
         return {
@@ -0,0 +1,64 @@
+"""
+Compares two benchmark reports and exits non-zero when the new one regressed.
+
+    python -m benchmarks.compare base.json head.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+# Metric name -> True when higher is better
+METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False
+}
+
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    """
+    Returns (scenario, metric, base, head, change) for every metric worse than threshold.
+    """
+    regressions = []
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base_result[metric], head_result[metric]
+            if not before:
+                continue
+            change = (after - before) / before
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append((name, metric, before, after, change))
+        if head_result["errors"] > base_result["errors"]:
+            regressions.append((name, "errors", base_result["errors"], head_result["errors"], None))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative change (default 0.1)")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    regressions = compare(base, head, args.threshold)
+    for name, metric, before, after, change in regressions:
+        delta = f" ({change:+.1%})" if change is not None else ""
+        print(f"{name}: {metric} {before} -> {after}{delta}")
+
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions between {base.get('commit')} and {head.get('commit')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Checks app.geo against geopy and measures the speed-up of the vectorized distances.
+
+    python -m benchmarks.geo_accuracy --pairs 5000 --tolerance-m 1
+
+Exits with status 1 when Vincenty differs from geopy's geodesic() by more than the
+tolerance on any pair (nearly antipodal pairs excluded, see vincenty_km()), a hub
+distance from the cached matrices differs from geopy, or a leg between codes that are
+hubs of another mode (CDG: Chandigarh station, Paris airport) is measured between the
+wrong places.
+"""
+from app.geo import vincenty_km, haversine_km, hub_distances, leg_distance_km, HUBS
+from geopy.distance import geodesic
+import numpy as np
+import argparse
+import time
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=5000)
+    parser.add_argument("--tolerance-m", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    src = np.c_[rng.uniform(-89, 89, args.pairs), rng.uniform(-180, 180, args.pairs)]
+    dst = np.c_[rng.uniform(-89, 89, args.pairs), rng.uniform(-180, 180, args.pairs)]
+
+    start = time.perf_counter()
+    reference = np.array([geodesic(a, b).km for a, b in zip(src, dst)])
+    geopy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vincenty = vincenty_km(src[:, 0], src[:, 1], dst[:, 0], dst[:, 1])
+    vincenty_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    haversine = haversine_km(src[:, 0], src[:, 1], dst[:, 0], dst[:, 1])
+    haversine_seconds = time.perf_counter() - start
+
+    # Vincenty does not converge within ~0.5 degrees of the antipode
+    regular = reference < 19900
+    vincenty_error_m = np.abs(vincenty - reference)[regular] * 1000
+    haversine_error = np.abs(haversine - reference) / reference
+
+    hub_error_m = {}
+    for mode, hubs in HUBS.items():
+        codes, matrix = hub_distances(mode)
+        hub_reference = np.array([[geodesic(hubs[a], hubs[b]).km for b in codes] for a in codes])
+        hub_error_m[mode] = np.abs(matrix - hub_reference).max() * 1000
+
+    # The same code in two modes: the leg is measured between the places of its own mode
+    paris_cdg = (49.0097, 2.5479)
+    legs = {
+        "air DEL-CDG": (leg_distance_km("air", "DEL", "CDG", HUBS["air"]["DEL"], paris_cdg),
+                        geodesic(HUBS["air"]["DEL"], paris_cdg).km),
+        "rail NDLS-CDG": (leg_distance_km("rail", "NDLS", "CDG", HUBS["rail"]["NDLS"], paris_cdg),
+                          geodesic(HUBS["rail"]["NDLS"], HUBS["rail"]["CDG"]).km),
+    }
+    leg_error_m = max(abs(km - reference) for km, reference in legs.values()) * 1000
+
+    print(f"{args.pairs} pairs ({int((~regular).sum())} nearly antipodal, excluded)")
+    print(f"vincenty:  max error {vincenty_error_m.max():.6f} m, {vincenty_seconds * 1000:.1f} ms "
+          f"({geopy_seconds / vincenty_seconds:.0f}x geopy)")
+    print(f"haversine: max relative error {haversine_error.max():.4%}, {haversine_seconds * 1000:.1f} ms "
+          f"({geopy_seconds / haversine_seconds:.0f}x geopy)")
+    print(f"geopy:     {geopy_seconds * 1000:.1f} ms")
+    for mode, error_m in hub_error_m.items():
+        print(f"{mode} hub matrix ({len(HUBS[mode])}x{len(HUBS[mode])}): max error {error_m:.6f} m")
+    for leg, (km, reference) in legs.items():
+        print(f"{leg}: {km:.2f} km (geopy {reference:.2f} km)")
+
+    # Leg distances are rounded to 10 m
+    if vincenty_error_m.max() > args.tolerance_m or max(hub_error_m.values()) > args.tolerance_m \
+            or leg_error_m > max(args.tolerance_m, 10):
+        print(f"FAILED: error above {args.tolerance_m} m")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures payload size and serialization time of the large JSON responses.
+
+    python -m benchmarks.payloads --output payloads.json
+
+For the catalog, the route options and a bulk forecast it compares the old encoding
+(pretty-printed, and for routes a dumps/loads round-trip) with orjson, and reports the
+bytes sent uncompressed, with gzip and with Brotli (when installed) through the app.
+"""
+from benchmarks import stubs
+from datetime import datetime, timezone
+import argparse
+import timeit
+import json
+import gzip
+
+
+def _time(func, repeat: int) -> float:
+    # Best of 5, in microseconds per call
+    return round(min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1e6, 1)
+
+
+def serialization(payload, repeat: int) -> dict:
+    import orjson
+
+    pretty = json.dumps(payload, indent=2)
+    compact = orjson.dumps(payload)
+    return {
+        "bytes": {
+            "pretty": len(pretty.encode()),
+            "compact": len(compact),
+            "gzip": len(gzip.compress(compact)),
+        },
+        "microseconds": {
+            "json_pretty": _time(lambda: json.dumps(payload, indent=2), repeat),
+            "json_pretty_roundtrip": _time(lambda: json.loads(json.dumps(payload, indent=2)), repeat),
+            "json_compact": _time(lambda: json.dumps(payload, separators=(",", ":")), repeat),
+            "orjson": _time(lambda: orjson.dumps(payload), repeat),
+        }
+    }
+
+
+def wire(client, method: str, url: str, **kwargs) -> dict:
+    out = {}
+    for encoding in ("identity", "gzip", "br"):
+        response = client.request(method, url, headers={"Accept-Encoding": encoding}, **kwargs)
+        # httpx decodes the body, so count the bytes that were actually sent
+        length = response.headers.get("content-length")
+        out[encoding] = {
+            "bytes": int(length) if length else len(response.content),
+            "content_encoding": response.headers.get("content-encoding", "identity")
+        }
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--horizon", type=int, default=6, help="Months per product in the bulk forecast payload")
+    parser.add_argument("--output", default="payloads.json")
+    args = parser.parse_args()
+
+    stubs.install()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routers.products import get_products
+    from app.routers.route_optimizer import best_route
+    from app.models.windowing import prediction_dates
+
+    catalog = get_products()
+    routes = best_route("Pune", "Delhi")
+    # Shaped like a /predict_stock horizon response for every product, without running the model
+    months = prediction_dates(horizon=args.horizon)
+    forecast = {name: {month: 100 + i for i, month in enumerate(months)} for name in catalog["products"]}
+
+    client = TestClient(app)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "serialization": {
+            "catalog": serialization(catalog, args.repeat),
+            "route_optimizer": serialization(routes, args.repeat),
+            "forecast": serialization(forecast, args.repeat),
+        },
+        "wire": {
+            "catalog": wire(client, "GET", "/get_products"),
+            "route_optimizer": wire(client, "POST", "/route_optimizer", json={"source": "Pune", "destination": "Delhi"}),
+        }
+    }
+
+    for name, result in report["serialization"].items():
+        print(f"{name}: {result['bytes']} bytes, {result['microseconds']} us", flush=True)
+    for name, result in report["wire"].items():
+        print(f"{name} over the wire: {result}", flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measures how the Prophet refresh scales with the number of worker processes.
+
+    python -m benchmarks.prophet_scaling --products 64 --workers 1 2 4 8 --output prophet_scaling.json
+
+Results are written to a throwaway store, the app's forecast store is left untouched.
+"""
+from app.models.forecast_store import ForecastStore
+from app.models.prophet_refresh import refresh, DATASET_PATH
+from datetime import datetime, timezone
+import pandas as pd
+import tempfile
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--output", default="prophet_scaling.json")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATASET_PATH).head(args.products)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "cpus": os.cpu_count(),
+        "products": len(data),
+        "chunk_size": args.chunk_size,
+        "runs": {}
+    }
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            target = ForecastStore(os.path.join(directory, f"forecasts-{workers}.json"))
+            result = refresh(data, workers=workers, chunk_size=args.chunk_size, target=target, progress=lambda *_: None)
+            baseline = baseline or result["seconds"]
+            report["runs"][workers] = {
+                "seconds": result["seconds"],
+                "products_per_second": round(result["fits"] / result["seconds"], 2),
+                "speedup": round(baseline / result["seconds"], 2)
+            }
+            print(f"{workers} workers: {result['seconds']} s, speedup {report['runs'][workers]['speedup']}x", flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
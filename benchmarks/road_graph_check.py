@@ -0,0 +1,114 @@
+"""
+Checks offline road routing (app.tools.road_graph) over the bundled sample graph.
+
+    python -m benchmarks.road_graph_check --graph app/tools/data/roads_sample.geojson
+
+Routes known city pairs and exits with status 1 when a route does not have the roadways
+tool's result shape, the shortest route is longer than the fastest one (or the fastest
+slower than the shortest), a road is shorter than the straight line between its ends, a
+graph saved to .npz routes differently, or an unknown place is routed at all.
+"""
+from app.tools.road_graph import RoadGraph
+from app import geo
+import argparse
+import tempfile
+import time
+import sys
+import os
+
+PAIRS = [
+    ("Pune", "Mumbai"),
+    ("Delhi", "Jaipur"),
+    ("Mumbai", "Ahmedabad"),
+    ("Bengaluru", "Chennai"),
+    ("Kolkata", "Bhubaneswar"),
+    ("Delhi", "Kolkata"),
+    ("Pune, Maharashtra", "New Delhi"),
+]
+
+UNKNOWN = [("Pune", "Atlantis"), ("Nowhere", "Delhi"), ("Paris", "Berlin")]
+
+# Keys and value types of the roadways tool's result
+SHAPE = {
+    "route_steps": list,
+    "total_distance_km": float,
+    "estimated_time_min": float,
+    "estimated_emission_kg": float,
+}
+
+
+def shape_errors(result) -> list[str]:
+    if not isinstance(result, dict):
+        return [f"expected a dict, got {type(result).__name__}"]
+    errors = [f"keys {sorted(result)} != {sorted(SHAPE)}"] if set(result) != set(SHAPE) else []
+    for key, kind in SHAPE.items():
+        if key in result and not isinstance(result[key], kind):
+            errors.append(f"{key} is {type(result[key]).__name__}, expected {kind.__name__}")
+    steps = result.get("route_steps")
+    if isinstance(steps, list) and (len(steps) < 2 or not all(isinstance(step, str) for step in steps)):
+        errors.append("route_steps should be at least one instruction and the arrival")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", default="app/tools/data/roads_sample.geojson")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    graph = RoadGraph.load(args.graph)
+    print(f"{args.graph}: {len(graph.lat)} nodes, {len(graph.indices)} edges, {len(graph.places)} places, "
+          f"loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "roads.npz")
+        graph.save(path)
+        saved = RoadGraph.load(path)
+
+    failures = []
+    for source, destination in PAIRS:
+        src, dst = graph.geocode(source), graph.geocode(destination)
+        if src is None or dst is None:
+            failures.append(f"{source} -> {destination}: not a place of the graph")
+            continue
+
+        fastest = graph.route(source, destination, "time")
+        failures += [f"{source} -> {destination}: {error}" for error in shape_errors(fastest)]
+
+        by_time, by_distance = graph.shortest_path(src, dst, "time"), graph.shortest_path(src, dst, "distance")
+        if by_time is None or by_distance is None:
+            failures.append(f"{source} -> {destination}: no route")
+            continue
+        time_km, distance_km = graph.length_m[by_time].sum() / 1000, graph.length_m[by_distance].sum() / 1000
+        time_min, distance_min = graph.time_s[by_time].sum() / 60, graph.time_s[by_distance].sum() / 60
+        straight_km = float(geo.haversine_km(graph.lat[src], graph.lng[src], graph.lat[dst], graph.lng[dst]))
+
+        # Costs are summed in a different order by A*; allow for rounding
+        if distance_km > time_km + 1e-6:
+            failures.append(f"{source} -> {destination}: shortest route {distance_km:.2f} km > fastest {time_km:.2f} km")
+        if time_min > distance_min + 1e-6:
+            failures.append(f"{source} -> {destination}: fastest route {time_min:.1f} min > shortest {distance_min:.1f} min")
+        if distance_km < straight_km - 1e-6:
+            failures.append(f"{source} -> {destination}: {distance_km:.2f} km by road < {straight_km:.2f} km straight")
+        if saved.route(source, destination) != fastest:
+            failures.append(f"{source} -> {destination}: the graph saved to .npz routes differently")
+
+        print(f"{source} -> {destination}: fastest {time_km:.1f} km / {time_min:.0f} min, "
+              f"shortest {distance_km:.1f} km / {distance_min:.0f} min, straight {straight_km:.1f} km, "
+              f"{len(fastest['route_steps']) if isinstance(fastest, dict) else 0} steps")
+
+    for source, destination in UNKNOWN:
+        result = graph.route(source, destination)
+        if result is not None:
+            failures.append(f"{source} -> {destination}: unknown place routed: {result}")
+    print(f"{len(UNKNOWN)} routes with an unknown place")
+
+    if failures:
+        print("FAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
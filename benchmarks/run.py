@@ -0,0 +1,124 @@
+"""
+Runs every endpoint in-process against offline stubs and writes the results as JSON.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --only predict_stock --sizes 1 10
+"""
+from benchmarks import stubs
+stubs.install()
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+import numpy as np
+import subprocess
+import platform
+import argparse
+import resource
+import json
+import time
+import sys
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def scenarios(sizes: list) -> dict:
+    from app.models.feature_store import feature_store
+
+    products = feature_store.product_names()
+    out = {
+        "get_products": {
+            "requests": 200, "concurrency": 8,
+            "call": lambda client, i: client.get("/get_products")
+        },
+        "route_optimizer": {
+            "requests": 20, "concurrency": 4,
+            "call": lambda client, i: client.post("/route_optimizer", json={"source": "Pune", "destination": "Delhi"})
+        },
+        "bot": {
+            "requests": 20, "concurrency": 4,
+            "call": lambda client, i: client.post("/bot", json={"chat_id": f"bench-{i % 4}", "prompt": "Which products do we stock?"})
+        }
+    }
+
+    for size in sizes:
+        selected = products if size == "all" else products[:int(size)]
+        out[f"predict_stock_{size}"] = {
+            "requests": 1 if size == "all" else max(2, 20 // int(size)),
+            "concurrency": 1,
+            "call": lambda client, i, selected=selected: client.post("/predict_stock", json={"products": selected})
+        }
+
+    return out
+
+
+def run_scenario(client: TestClient, scenario: dict) -> dict:
+    # Warm up once so TensorFlow graph tracing and lazy imports are not timed
+    scenario["call"](client, -1)
+
+    def timed(i):
+        start = time.perf_counter()
+        response = scenario["call"](client, i)
+        return time.perf_counter() - start, response.status_code < 400 and response.json() is not None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scenario["concurrency"]) as pool:
+        results = list(pool.map(timed, range(scenario["requests"])))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    return {
+        "requests": scenario["requests"],
+        "concurrency": scenario["concurrency"],
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput_rps": round(scenario["requests"] / elapsed, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--sizes", nargs="+", default=["1", "10", "100", "all"], help="product counts for /predict_stock")
+    parser.add_argument("--only", nargs="+", help="run only scenarios whose name starts with one of these")
+    args = parser.parse_args()
+
+    from app.main import app
+
+    report = {
+        "commit": commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "scenarios": {}
+    }
+
+    with TestClient(app) as client:
+        for name, scenario in scenarios(args.sizes).items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            print(f"Running {name}...", flush=True)
+            report["scenarios"][name] = result = run_scenario(client, scenario)
+            print(f"  {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                  f"{result['errors']} errors, peak RSS {result['peak_rss_mb']} MB", flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
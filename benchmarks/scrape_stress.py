@@ -0,0 +1,222 @@
+"""
+Stress test of the browser supervision (app.supervisor) with failing scrapes.
+
+    python -m benchmarks.scrape_stress --scrapes 200 --concurrency 8
+
+The scrapers run against fake browsers that start real processes, named like
+chromedriver and Chrome, so leaks show up in the process table. Failures are injected
+at random:
+- parser failures, both while reading the result cards in the browser and when parsing them;
+- quit() failing and leaving the browser running;
+- chromedriver crashing mid-scrape, leaving Chrome orphaned.
+
+The memory ceiling is then lowered below the current usage to check that scraping is
+shed, and a few /route_optimizer requests record their peak memory. Exits with status 1
+when browser processes are still running once the supervisor has swept.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from threading import Lock
+from benchmarks import stubs
+import subprocess
+import tempfile
+import argparse
+import random
+import shutil
+import signal
+import time
+import json
+import sys
+import os
+
+
+class InjectedFailure(Exception):
+    pass
+
+
+def browser_processes() -> list[int]:
+    from app.supervisor import _processes, _descendants, _is_browser
+    processes = _processes()
+    return [
+        pid for pid in _descendants(os.getpid(), processes)
+        if _is_browser(processes[pid][1]) and processes[pid][2] != "Z"
+    ]
+
+
+def fake_browser_class(bin_dir: str, args):
+    """
+    A FakeChrome whose driver is a real 'chromedriver' process running a 'chrome' child.
+    """
+    rng = random.Random(args.seed)
+    lock = Lock()
+
+    def roll(rate: float) -> bool:
+        with lock:
+            return rng.random() < rate
+
+    class FailingElement(stubs.FakeElement):
+        def get_attribute(self, name: str):
+            raise InjectedFailure("card")
+
+    class LeakyChrome(stubs.FakeChrome):
+        def __init__(self, *a, **kwargs):
+            super().__init__()
+            env = {**os.environ, "PATH": bin_dir}
+            process = subprocess.Popen([shutil.which("sh"), "-c", "chrome 600 & exec chromedriver 600"], env=env)
+            self.service = SimpleNamespace(process=process)
+            self.failing_cards = roll(args.card_failure_rate)
+
+        def get(self, url: str):
+            super().get(url)
+            if roll(args.crash_rate):
+                # chromedriver dies; its Chrome is orphaned
+                self.service.process.kill()
+                self.service.process.wait()
+
+        def find_elements(self, by, value):
+            elements = super().find_elements(by, value)
+            if self.failing_cards:
+                elements[-1] = FailingElement(elements[-1].html)
+            return elements
+
+        def quit(self):
+            process = self.service.process
+            if roll(args.quit_failure_rate):
+                raise InjectedFailure("quit")
+            # What chromedriver does on quit: close Chrome, then exit
+            try:
+                with open(f"/proc/{process.pid}/task/{process.pid}/children") as f:
+                    children = [int(pid) for pid in f.read().split()]
+            except OSError:
+                children = []
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            process.terminate()
+            process.wait()
+
+    return LeakyChrome, roll
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scrapes", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--card-failure-rate", type=float, default=0.2, help="Share of scrapes failing on a result card")
+    parser.add_argument("--parse-failure-rate", type=float, default=0.2, help="Share of scrapes failing to parse")
+    parser.add_argument("--quit-failure-rate", type=float, default=0.2)
+    parser.add_argument("--crash-rate", type=float, default=0.1, help="Share of scrapes whose chromedriver crashes")
+    parser.add_argument("--routes", type=int, default=5, help="/route_optimizer requests for the memory metric")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="scrape_stress.json")
+    args = parser.parse_args()
+
+    stubs.install()
+    from app import supervisor as supervision, metrics, geo
+    from app.supervisor import supervisor, ScrapingPaused
+    from app.tools import airways, railways
+    from app.tools.scrape_cache import scrape_cache
+
+    # Sweep often and treat orphans as such right away, so the run does not wait minutes
+    supervision.ORPHAN_GRACE_SECONDS = 0
+    supervisor.interval = 1
+    supervisor.start()
+
+    bin_dir = tempfile.mkdtemp()
+    for name in ("chromedriver", "chrome"):
+        shutil.copy(shutil.which("sleep"), os.path.join(bin_dir, name))
+    LeakyChrome, roll = fake_browser_class(bin_dir, args)
+    airways.webdriver = railways.webdriver = SimpleNamespace(Chrome=LeakyChrome)
+
+    # Every fetch scrapes: nothing is served from the cache
+    scrape_cache.ttl = {"airways": 0, "railways": 0}
+
+    def failing(parse):
+        def wrapper(cards):
+            if roll(args.parse_failure_rate):
+                raise InjectedFailure("parse")
+            return parse(cards)
+        return wrapper
+
+    parsers = {"flights": failing(airways.parse_flights), "trains": failing(railways.parse_trains)}
+    airways.parse_flights, railways.parse_trains = parsers["flights"], parsers["trains"]
+
+    def scrape(i):
+        rng = random.Random(args.seed + i)
+        if i % 2:
+            fetch, codes = airways.fetch_flights, geo.AIRPORTS
+        else:
+            fetch, codes = railways.fetch_trains, geo.STATIONS
+        try:
+            fetch(*rng.sample(codes, 2))
+            return "ok"
+        except ScrapingPaused:
+            return "shed"
+        except InjectedFailure as e:
+            return f"failed_{e}"
+        except Exception as e:
+            return f"error_{type(e).__name__}"
+
+    def run(count: int) -> dict:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            outcomes = list(pool.map(scrape, range(count)))
+        return {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+
+    started = time.perf_counter()
+    outcomes = run(args.scrapes)
+    elapsed = time.perf_counter() - started
+    leaked_before_sweep = len(browser_processes())
+
+    # Orphans are killed by the next sweep
+    time.sleep(supervisor.interval + 1)
+    leaked = len(browser_processes())
+
+    # A ceiling below the current usage sheds every new scrape
+    supervisor.ceiling_mb = supervisor.sample() * 0.5
+    supervisor.sample()
+    shed = run(args.concurrency)
+    supervisor.ceiling_mb = 0
+    supervisor.sample()
+
+    route_memory = None
+    if args.routes:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        with TestClient(app) as client:
+            for _ in range(args.routes):
+                client.post("/route_optimizer", json={"source": "Pune", "destination": "Delhi"})
+        route_memory = metrics.snapshot().get("http_request_peak_rss_delta_mb", {})
+
+    # The app's shutdown stopped the supervisor, which kills the browsers still running
+    supervisor.stop()
+    leaked_after_routes = len(browser_processes())
+
+    reaped = {dict(labels)["reason"]: value for labels, value in metrics.snapshot().get("supervisor_reaped_total", {}).items()}
+    report = {
+        "scrapes": args.scrapes,
+        "seconds": round(elapsed, 2),
+        "outcomes": outcomes,
+        "browser_processes_before_sweep": leaked_before_sweep,
+        "browser_processes_after_sweep": leaked,
+        "reaped": reaped,
+        "under_ceiling": shed,
+        "route_peak_rss_delta_mb": {
+            dict(labels)["route"]: {"count": value["count"], "mean": round(value["sum"] / value["count"], 1)}
+            for labels, value in (route_memory or {}).items()
+        },
+        "browser_processes_at_exit": leaked_after_routes,
+    }
+    print(json.dumps(report, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    shutil.rmtree(bin_dir, ignore_errors=True)
+
+    if leaked or leaked_after_routes or shed.get("ok"):
+        print("FAILED: browsers leaked, or scraping was not shed above the ceiling")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
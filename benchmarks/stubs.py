@@ -0,0 +1,137 @@
+"""
+Offline replacements for every external service the app talks to.
+
+install() must run before the app is imported: the LLM gateway picks its backend
+from LLM_BACKEND at import time.
+"""
+from types import SimpleNamespace
+from pathlib import Path
+from bs4 import BeautifulSoup
+import tempfile
+import json
+import os
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _fixture(name: str):
+    path = FIXTURES / name
+    return json.loads(path.read_text()) if path.suffix == ".json" else path.read_text()
+
+
+def _tool_names(kwargs) -> list:
+    return [tool["function"]["name"] for tool in kwargs.get("tools") or []]
+
+
+def llm_responder(messages, **kwargs):
+    """
+    Answers gateway calls from fixtures/llm.json, based on the tools bound to the call.
+    """
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    llm = _fixture("llm.json")
+    tools = _tool_names(kwargs)
+    last = messages[-1] if messages else None
+
+    def tool_calls(calls):
+        return AIMessage(content="", tool_calls=[
+            {"name": call["name"], "args": call["args"], "id": f"call_{i}"} for i, call in enumerate(calls)
+        ])
+
+    if tools == ["RouteOptions"]:
+        return tool_calls([{"name": "RouteOptions", "args": llm["summarizer_routes"]}])
+    if tools == ["ResourceEstimate"]:
+        return tool_calls([{"name": "ResourceEstimate", "args": {"forklifts": 4, "trucks": 3, "labour": 42}}])
+    if "get_airways_route_info" in tools:
+        return tool_calls(llm["planner_tool_calls"])
+    if "summary of the conversation" in str(getattr(last, "content", "")).lower():
+        return llm["summary"]
+    if "search_products" in tools and not isinstance(last, ToolMessage):
+        return tool_calls([llm["bot_tool_call"]])
+    return llm["bot_reply"]
+
+
+class FakeElement:
+    def __init__(self, html: str):
+        self.html = html
+
+    def get_attribute(self, name: str):
+        return self.html if name == "outerHTML" else None
+
+
+class FakeChrome:
+    """
+    Stands in for selenium's webdriver.Chrome, serving the recorded result pages.
+    """
+    def __init__(self, *args, **kwargs):
+        self.soup = None
+
+    def get(self, url: str):
+        page = "ixigo.html" if "ixigo" in url else "cheapflights.html"
+        self.soup = BeautifulSoup(_fixture(page), "html.parser")
+
+    def find_elements(self, by, value):
+        return [FakeElement(str(tag)) for tag in self.soup.find_all(class_=value)]
+
+    def execute_script(self, *args):
+        return None
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def quit(self):
+        pass
+
+
+class FakeORSClient:
+    def pelias_search(self, text, **kwargs):
+        return _fixture("services.json")["pelias_search"]
+
+    def directions(self, **kwargs):
+        return _fixture("services.json")["directions"]
+
+
+class FakeNominatim:
+    def __init__(self, *args, **kwargs):
+        services = _fixture("services.json")
+        self.places = services["nominatim"]
+        self.default = services["nominatim_default"]
+
+    def geocode(self, query, **kwargs):
+        latitude, longitude = self.places.get(query, self.default)
+        return SimpleNamespace(latitude=latitude, longitude=longitude, address=query)
+
+
+def install():
+    """
+    Switches the app to the fake LLM backend and patches the scrapers, ORS and Nominatim.
+    """
+    os.environ["LLM_BACKEND"] = "fake"
+    # The provider rate limits would otherwise dominate the timings
+    os.environ.setdefault("OPENAI_REQUESTS_PER_SECOND", "10000")
+    os.environ.setdefault("OPENAI_BURST", "10000")
+    os.environ.setdefault("GEMINI_REQUESTS_PER_SECOND", "10000")
+    os.environ.setdefault("GEMINI_BURST", "10000")
+    os.environ.setdefault("OPEN_ROUTE_SERVICES_API_KEY", "offline")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    # Keep the benchmark's scrapes out of the app's scrape cache
+    os.environ.setdefault("SCRAPE_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "scrape_cache.db"))
+    # Keep /predict_stock measuring the model: no background refresh, no table from an earlier run
+    os.environ.setdefault("FORECAST_TABLE_ENABLED", "false")
+    os.environ.setdefault("FORECAST_TABLE_PATH", os.path.join(tempfile.mkdtemp(), "forecast_table.db"))
+    # Route roads offline over the bundled schematic network
+    os.environ.setdefault("ROAD_GRAPH_PATH", "app/tools/data/roads_sample.geojson")
+    os.makedirs("chats", exist_ok=True)
+
+    from app import llm
+    from app.tools import airways, railways, roadways, seaways
+
+    llm.set_fake_responder(llm_responder)
+    airways.webdriver = SimpleNamespace(Chrome=FakeChrome)
+    railways.webdriver = SimpleNamespace(Chrome=FakeChrome)
+    # The scraper sleeps to let the page render; nothing renders offline
+    railways.PAGE_SETTLE_SECONDS = 0
+    railways.SCROLL_SETTLE_SECONDS = 0
+    roadways.client = FakeORSClient()
+    seaways.Nominatim = FakeNominatim
@@ -0,0 +1,148 @@
+"""
+Measures memory per worker and throughput against the number of workers of the
+pre-forking server (app.serve), running against the offline stubs.
+
+    python -m benchmarks.workers --workers 1 2 4 --output workers.json
+
+For every worker count the server is started, /predict_stock and /get_products are
+driven for a fixed time, and the RSS and PSS (proportional set size, where pages
+shared with the master and the other workers are split between them) of every
+process is read from /proc. Linux only.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import argparse
+import httpx
+import json
+import time
+import sys
+import os
+
+
+def memory_mb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = round(int(rest.split()[0]) / 1024, 1)
+    return values
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_ready(url: str, workers: int, master: subprocess.Popen, products: list[str], timeout: float) -> list[int]:
+    """
+    Waits until every worker answers and returns their pids.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError(f"Server exited with status {master.returncode}")
+        pids = children(master.pid)
+        if len(pids) == workers:
+            try:
+                # Warm every worker: the kernel spreads connections across the accepting processes
+                for _ in range(workers * 4):
+                    httpx.post(f"{url}/predict_stock", json={"products": products}, timeout=60).raise_for_status()
+                return pids
+            except httpx.HTTPError:
+                pass
+        time.sleep(1)
+    raise TimeoutError("Workers did not start in time")
+
+
+def drive(url: str, products: list[str], seconds: float, concurrency: int) -> dict:
+    deadline = time.monotonic() + seconds
+    calls = [
+        ("predict_stock", lambda client: client.post("/predict_stock", json={"products": products})),
+        ("get_products", lambda client: client.get("/get_products", params={"q": "a"}))
+    ]
+
+    def loop(i):
+        counts = {name: 0 for name, _ in calls}
+        errors = 0
+        with httpx.Client(base_url=url, timeout=60) as client:
+            while time.monotonic() < deadline:
+                name, call = calls[i % len(calls)]
+                i += 1
+                if call(client).status_code == 200:
+                    counts[name] += 1
+                else:
+                    errors += 1
+        return counts, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(loop, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    out = {"errors": sum(errors for _, errors in results)}
+    for name, _ in calls:
+        out[f"{name}_rps"] = round(sum(counts[name] for counts, _ in results) / elapsed, 1)
+    return out
+
+
+def measure(workers: int, products: list[str], args) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    master = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.workers", "--serve", str(workers), "--port", str(args.port)],
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    try:
+        pids = wait_ready(url, workers, master, products, args.startup_timeout)
+        throughput = drive(url, products, args.seconds, args.concurrency)
+        worker_memory = [memory_mb(pid) for pid in pids]
+        master_memory = memory_mb(master.pid)
+    finally:
+        master.terminate()
+        master.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        **throughput,
+        "master_rss_mb": master_memory["rss"],
+        "worker_rss_mb": round(sum(m["rss"] for m in worker_memory) / workers, 1),
+        "worker_pss_mb": round(sum(m["pss"] for m in worker_memory) / workers, 1),
+        "total_pss_mb": round(master_memory["pss"] + sum(m["pss"] for m in worker_memory), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--products", type=int, default=5, help="Products per /predict_stock call")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--output", default="workers.json")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's logs")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        from benchmarks import stubs
+        from app.serve import serve
+        serve("127.0.0.1", args.port, args.serve, "warning", setup=stubs.install)
+        return
+
+    from app.models.feature_store import feature_store
+    products = feature_store.product_names()[:args.products]
+
+    results = []
+    for workers in args.workers:
+        result = measure(workers, products, args)
+        results.append(result)
+        print(json.dumps(result))
+
+    with open(args.output, "w") as f:
+        json.dump({"cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
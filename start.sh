@@ -1,2 +1,7 @@
 #!/usr/bin/env bash
-uvicorn app.main:app --host 0.0.0.0 --port 10000
+# WEB_WORKERS > 1 runs the pre-forking server, which shares the loaded state between workers
+if [ "${WEB_WORKERS:-1}" -gt 1 ]; then
+  python -m app.serve --host 0.0.0.0 --port 10000 --workers "$WEB_WORKERS"
+else
+  uvicorn app.main:app --host 0.0.0.0 --port 10000
+fi